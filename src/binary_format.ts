@@ -0,0 +1,140 @@
+/*!
+ * Wunderbaum - binary_format
+ * Copyright (c) 2021-2025, Martin Wendt. Released under the MIT license.
+ * @VERSION, @DATE (https://github.com/mar10/wunderbaum)
+ */
+
+import { SourceObjectType, WbNodeData } from "./types";
+import * as util from "./util";
+
+/** File format version of the binary tree format (`*.wbt`). */
+export const BINARY_FORMAT_VERSION = 1;
+
+/** 'WBT' */
+const MAGIC = [0x57, 0x42, 0x54];
+
+/**
+ * Return true if a fetch response contains the binary tree format, i.e. the
+ * URL ends with `.wbt` or the Content-Type is `application/x-wunderbaum-tree`.
+ */
+export function isBinaryResponse(url: string, response: Response): boolean {
+  const contentType = response.headers.get("Content-Type") ?? "";
+  return (
+    contentType.includes("application/x-wunderbaum-tree") ||
+    /\.wbt$/i.test(url.split(/[?#]/)[0])
+  );
+}
+
+/** Return true if `buffer` starts with the binary tree format signature. */
+export function isBinarySource(buffer: any): buffer is ArrayBuffer {
+  if (!(buffer instanceof ArrayBuffer) || buffer.byteLength < 8) {
+    return false;
+  }
+  const bytes = new Uint8Array(buffer, 0, 3);
+  return MAGIC.every((b, i) => bytes[i] === b);
+}
+
+/**
+ * Convert the binary tree format to a source object in 'nested' format.
+ *
+ * The layout is described in `test/generator/binary_format.py`, which also
+ * implements the encoder:
+ * magic & version, JSON header, string table, varint parent deltas,
+ * a presence bitmap per node, and one typed value column per field.
+ */
+export function decodeBinarySource(buffer: ArrayBuffer): SourceObjectType {
+  util.assert(isBinarySource(buffer), "Invalid binary tree format signature");
+
+  const view = new DataView(buffer);
+  const bytes = new Uint8Array(buffer);
+  const version = bytes[3];
+  util.assert(
+    version === BINARY_FORMAT_VERSION,
+    `Expected binary format version ${BINARY_FORMAT_VERSION} instead of ${version}`
+  );
+  const textDecoder = new TextDecoder();
+  const headerLen = view.getUint32(4, true);
+  let pos = 8 + headerLen;
+  const { nodeCount, fields, ...header } = JSON.parse(
+    textDecoder.decode(bytes.subarray(8, pos))
+  );
+
+  // Unsigned LEB128. Use multiplication instead of bit shifts, so we support
+  // values up to 2^53.
+  const readVarint = (): number => {
+    let res = 0;
+    let factor = 1;
+    let b;
+    do {
+      b = bytes[pos++];
+      res += (b & 0x7f) * factor;
+      factor *= 128;
+    } while (b >= 0x80);
+    return res;
+  };
+
+  const stringCount = readVarint();
+  const strings = new Array<string>(stringCount);
+  for (let i = 0; i < stringCount; i++) {
+    const len = readVarint();
+    strings[i] = textDecoder.decode(bytes.subarray(pos, pos + len));
+    pos += len;
+  }
+
+  const nodeList = new Array<WbNodeData>(nodeCount);
+  const children: WbNodeData[] = [];
+  for (let i = 0; i < nodeCount; i++) {
+    const node = <WbNodeData>{};
+    const delta = readVarint();
+    nodeList[i] = node;
+    if (delta) {
+      const parent = nodeList[i - delta];
+      parent.children ??= [];
+      parent.children.push(node);
+    } else {
+      children.push(node);
+    }
+  }
+
+  const bitmapWidth = (fields.length + 7) >> 3;
+  const bitmapStart = pos;
+  pos += nodeCount * bitmapWidth;
+
+  fields.forEach(([name, kind]: [string, string], f: number) => {
+    const byteOfs = bitmapStart + (f >> 3);
+    const mask = 1 << (f & 7);
+
+    for (let i = 0; i < nodeCount; i++) {
+      if (!(bytes[byteOfs + i * bitmapWidth] & mask)) {
+        continue;
+      }
+      let value: any;
+      switch (kind) {
+        case "str":
+          value = strings[readVarint()];
+          break;
+        case "int": {
+          const n = readVarint();
+          // Zigzag decoding (without 32-bit bit operations)
+          value = n % 2 ? -(n + 1) / 2 : n / 2;
+          break;
+        }
+        case "float":
+          value = view.getFloat64(pos, true);
+          pos += 8;
+          break;
+        case "bool":
+          value = bytes[pos++] !== 0;
+          break;
+        case "json":
+          value = JSON.parse(strings[readVarint()]);
+          break;
+        default:
+          util.error(`Unsupported binary field kind: ${kind}`);
+      }
+      (<any>nodeList[i])[name] = value;
+    }
+  });
+
+  return { ...header, children: children };
+}
@@ -122,6 +122,12 @@ export const defaultIconMaps: { [key in IconLibrary]: IconMapType } = {
 
 export const KEY_NODATA = "__not_found__";
 
+/** Number of NDJSON lines that are parsed before nodes are added. */
+export const NDJSON_BATCH_SIZE = 1000;
+
+/** Prefix for `node.data` properties that store precomputed sort ranks. */
+export const SORT_RANK_PREFIX = "_sortRank_";
+
 /** Define which keys are handled by embedded <input> control, and should
  * *not* be passed to tree navigation handler in cell-edit mode.
  */
@@ -139,7 +145,11 @@ export const INPUT_KEYS: { [key: string]: Array<string> } = {
 export const RESERVED_TREE_SOURCE_KEYS: Set<string> = new Set([
   "_format", // reserved for future use
   "_keyMap", // Used for compressed data format
+  "_nodeData", // Parallel node.data values (e.g. subtree aggregates)
   "_positional", // Used for compressed data format
+  "_prefetch", // Prefetch manifest of a first-paint payload
+  "_sortRanks", // Precomputed sibling ranks for sorting
+  "_templates", // Shared child lists, referenced by node.refKey
   "_typeList", // Used for compressed data format @deprecated
   "_valueMap", // Used for compressed data format
   "_version", // reserved for future use
@@ -453,5 +463,87 @@ export function decompressSourceData(source: SourceObjectType): void {
   }
   if (_keyMap || _valueMap) {
     _iter(source.children);
+    for (const template of Object.values(source._templates ?? {})) {
+      _iter(template);
+    }
+  }
+}
+
+/**
+ * Return true if a fetch response contains newline-delimited JSON, i.e. the
+ * Content-Type or the URL suffix is `ndjson` or `jsonl`.
+ */
+export function isNdjsonResponse(url: string, response: Response): boolean {
+  const contentType = response.headers.get("Content-Type") ?? "";
+  return (
+    /ndjson|jsonl/i.test(contentType) ||
+    /\.(ndjson|jsonl)$/i.test(url.split(/[?#]/)[0])
+  );
+}
+
+/**
+ * Read a fetch response as newline-delimited JSON stream and call `callback`
+ * with batches of parsed lines while data is still arriving.
+ *
+ * A batch is passed when `batchSize` lines were parsed, or when the current
+ * network chunk was processed (so first lines are available early).
+ * The callback may return false to cancel the download.
+ *
+ * @returns false if the callback canceled reading.
+ */
+export async function readNdjsonStream(
+  response: Response,
+  callback: (batch: any[]) => boolean | void,
+  batchSize = NDJSON_BATCH_SIZE
+): Promise<boolean> {
+  const reader = response.body?.getReader();
+  const decoder = new TextDecoder();
+  let batch: any[] = [];
+  let rest = "";
+
+  // Parse complete lines and pass full batches. Return false if canceled.
+  const _parseLines = (text: string): boolean => {
+    for (const line of text.split("\n")) {
+      if (!line.trim()) {
+        continue;
+      }
+      batch.push(JSON.parse(line));
+      if (batch.length >= batchSize) {
+        if (callback(batch) === false) {
+          return false;
+        }
+        batch = [];
+      }
+    }
+    return true;
+  };
+  const _flush = (): boolean => {
+    const res = batch.length ? callback(batch) !== false : true;
+    batch = [];
+    return res;
+  };
+
+  if (!reader) {
+    // Streaming not supported: fall back to reading the complete response
+    return _parseLines(await response.text()) && _flush();
+  }
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) {
+      break;
+    }
+    const text = rest + decoder.decode(value, { stream: true });
+    const lastNewline = text.lastIndexOf("\n");
+    if (lastNewline < 0) {
+      rest = text;
+      continue;
+    }
+    rest = text.slice(lastNewline + 1);
+    if (!_parseLines(text.slice(0, lastNewline)) || !_flush()) {
+      await reader.cancel();
+      return false;
+    }
   }
+  rest += decoder.decode();
+  return _parseLines(rest) && _flush();
 }
@@ -45,14 +45,49 @@ export interface SourceObjectType {
   _positional?: Array<string>;
   // _typeList?: Array<string>;
   _valueMap?: { [key: string]: Array<string> };
+  /** Precomputed sibling ranks per property name, indexed in pre-order.
+   * @see {@link WunderbaumNode.sort}
+   */
+  _sortRanks?: { [propName: string]: Array<number> };
+  /** Additional `node.data` values per property name, indexed in pre-order
+   * (e.g. precomputed `descendantCount` or subtree aggregates).
+   */
+  _nodeData?: { [propName: string]: Array<any> };
+  /** Shared child lists of repeated subtrees. Nodes without `children`
+   * whose `refKey` matches a template get the child nodes on demand.
+   */
+  _templates?: { [refKey: string]: SourceListType };
+  /** Prefetch manifest of a 'first paint' payload, sorted by priority.
+   * Child lists of lazy placeholder nodes are loaded from these chunks in
+   * the background.
+   */
+  _prefetch?: Array<PrefetchChunkType>;
+}
+
+/**
+ * Entry of a prefetch manifest (`source._prefetch`).
+ * The chunk is a source object with one top-level entry `{key, children}`
+ * per placeholder node.
+ * @since 0.14.2
+ */
+export interface PrefetchChunkType {
+  /** URL of the chunk (relative to the payload URL). */
+  url: string;
+  /** Keys of the placeholder nodes that get their children from this chunk. */
+  keys: Array<string>;
+  /** Total number of nodes in the chunk (informational). */
+  nodeCount?: number;
 }
 
-/** Possible initilization for tree nodes. */
+/** Possible initilization for tree nodes.
+ * An `ArrayBuffer` is expected to contain the binary tree format (`*.wbt`).
+ */
 export type SourceType =
   | string
   | SourceListType
   | SourceAjaxType
-  | SourceObjectType;
+  | SourceObjectType
+  | ArrayBuffer;
 
 /** Passed to `find...()` methods. Should return true if node matches. */
 export type MatcherCallback = (node: WunderbaumNode) => boolean;
@@ -758,6 +793,10 @@ export interface FilterNodesOptions {
   mode?: FilterModeType;
   /** Display a 'no data' status node if result is empty @default true */
   noData?: boolean | string;
+  /** Use the search index (if any) to find candidates for string filters.
+   * See {@link Wunderbaum.setSearchIndex}. @default true
+   */
+  useSearchIndex?: boolean;
 }
 
 /** Possible values for {@link Wunderbaum.getState}. */
@@ -1000,6 +1039,19 @@ export interface SortOptions {
   updateColInfo?: boolean;
   /** Column ID as defined in `tree.columns` definition. Required if updateColInfo is true.*/
   colId?: string;
+  /**
+   * Use precomputed sibling ranks (passed as `source._sortRanks`) if available.
+   * This replaces the comparison sort by a linear reorder.
+   * Ranks of a node are discarded when its title is set or a cell is
+   * edited (so its siblings are compared instead). Pass false if node values
+   * were changed otherwise after loading. Ranks are ignored if `key`, `cmp`,
+   * or {@link WunderbaumOptions.sortFoldersFirst} are set.
+   * Siblings with equal values keep the order in which they were loaded
+   * (also for `order: "desc"`).
+   * @default true
+   * @since 0.14.2
+   */
+  useSortRanks?: boolean;
 }
 
 /**
@@ -1039,6 +1091,22 @@ export interface FilterConnectType {
   matchInfoElem?: string | HTMLElement | null;
 }
 
+/**
+ * Prebuilt n-gram search index, e.g. created by the fixture generator.
+ * See {@link Wunderbaum.setSearchIndex}.
+ * @since 0.14.2
+ */
+export interface SearchIndexType {
+  _format: "ngram";
+  _version: number;
+  /** Length of the n-grams. */
+  n: number;
+  /** Number of nodes that were indexed (must match the tree). */
+  nodeCount: number;
+  /** Map field name -> n-gram -> delta-encoded, pre-order node indexes. */
+  fields: { [field: string]: { [term: string]: Array<number> } };
+}
+
 /**
  * Passed as tree options to configure default filtering behavior.
  *
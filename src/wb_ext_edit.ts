@@ -17,6 +17,7 @@ import {
   ValidationError,
 } from "./util";
 import { debounce } from "./debounce";
+import { SORT_RANK_PREFIX } from "./common";
 import { WunderbaumNode } from "./wb_node";
 import { EditOptionsType, InsertNodeType, WbNodeData } from "./types";
 
@@ -126,6 +127,10 @@ export class EditExtension extends WunderbaumExtension<EditOptionsType> {
       this.tree.log("Ignored change event for removed element or node title");
       return;
     }
+    // The handler typically stores the value as `node.data[colId]`, so
+    // precomputed sort ranks of this column are stale now
+    delete node.data[SORT_RANK_PREFIX + info.colId];
+    this.tree._modifyVersion++; // Search index is stale, too
     // See also WbChangeEventType
     this._applyChange("change", node, colElem, e.target as HTMLInputElement, {
       info: info,
@@ -18,6 +18,7 @@ import {
   FilterOptionsType,
   NodeFilterCallback,
   NodeStatusType,
+  SearchIndexType,
 } from "./types";
 import { Wunderbaum } from "./wunderbaum";
 import { WunderbaumNode } from "./wb_node";
@@ -28,6 +29,7 @@ const START_MARKER = "\uFFF7";
 const END_MARKER = "\uFFF8";
 const RE_START_MARKER = new RegExp(escapeRegex(START_MARKER), "g");
 const RE_END_MARTKER = new RegExp(escapeRegex(END_MARKER), "g");
+const SEARCH_INDEX_VERSION = 1;
 
 export class FilterExtension extends WunderbaumExtension<FilterOptionsType> {
   public queryInput: HTMLInputElement | null = null;
@@ -36,6 +38,13 @@ export class FilterExtension extends WunderbaumExtension<FilterOptionsType> {
   public modeButton: HTMLButtonElement | null = null;
   public matchInfoElem: HTMLElement | null = null;
   public lastFilterArgs: IArguments | null = null;
+  protected searchIndex: SearchIndexType | null = null;
+  /** Nodes in the pre-order of the search index (resolved by `setSearchIndex()`). */
+  protected indexedNodes: WunderbaumNode[] | null = null;
+  /** `tree._modifyVersion` at the time `indexedNodes` was resolved. */
+  protected indexedVersion = -1;
+  /** Nodes matched by the last filter, so it can be reset without a full scan. */
+  protected lastMatches: WunderbaumNode[] | null = [];
 
   constructor(tree: Wunderbaum) {
     super(tree, "filter", {
@@ -49,6 +58,7 @@ export class FilterExtension extends WunderbaumExtension<FilterOptionsType> {
       leavesOnly: false, // Match end nodes only
       mode: "dim", // Grayout unmatched nodes (pass "hide" to remove unmatched node instead)
       noData: true, // Display a 'no data' status node if result is empty
+      useSearchIndex: true, // Use the search index (if any) for string filters
     });
   }
 
@@ -166,6 +176,121 @@ export class FilterExtension extends WunderbaumExtension<FilterOptionsType> {
     this._updatedConnectedControls();
   }
 
+  /**
+   * [ext-filter] Set or remove (pass null) a prebuilt n-gram search index.
+   *
+   * The index refers to nodes by their pre-order position, so it must be set
+   * after the matching source was loaded and before nodes are reordered.
+   * The index is resolved to nodes once, so sorting or moving nodes later is
+   * fine. Adding or removing nodes (e.g. by lazy loading), or changing titles
+   * or cell values drops the index (filters fall back to a full scan then).
+   */
+  setSearchIndex(index: SearchIndexType | null): void {
+    this.searchIndex = null;
+    this.indexedNodes = null;
+    if (index) {
+      assert(
+        index._format === "ngram",
+        `Expected search index _format 'ngram': ${index._format}`
+      );
+      assert(
+        index._version === SEARCH_INDEX_VERSION,
+        `Expected search index version ${SEARCH_INDEX_VERSION} instead of ${index._version}`
+      );
+      const nodeList: WunderbaumNode[] = [];
+      this.tree.visit((node) => {
+        if (node.statusNodeType) {
+          return "skip";
+        }
+        nodeList.push(node);
+      });
+      if (nodeList.length !== index.nodeCount) {
+        this.tree.logWarn(
+          `Search index expects ${index.nodeCount} nodes, ` +
+            `but tree has ${nodeList.length}: ignored.`
+        );
+        return;
+      }
+      this.searchIndex = index;
+      this.indexedNodes = nodeList;
+      this.indexedVersion = this.tree._modifyVersion;
+    }
+  }
+
+  /**
+   * Return sorted, pre-order node indexes that may match `query`, or null if
+   * the search index cannot be used for this query.
+   */
+  protected _lookupIndexes(query: string, field: string): number[] | null {
+    const index = this.searchIndex;
+    const terms = index?.fields[field];
+    if (!index || !terms || query.length < index.n) {
+      return null;
+    }
+    const n = index.n;
+    const lists: number[][] = [];
+    const seen = new Set<string>();
+
+    query = query.toLowerCase();
+    for (let i = 0; i <= query.length - n; i++) {
+      const term = query.slice(i, i + n);
+      if (seen.has(term)) {
+        continue;
+      }
+      seen.add(term);
+      const deltas = terms[term];
+      if (!deltas) {
+        return []; // No node contains this n-gram
+      }
+      lists.push(deltas);
+    }
+    // Intersect, starting with the shortest posting list
+    lists.sort((a, b) => a.length - b.length);
+    let res = _decodeDeltas(lists[0]);
+    for (let i = 1; i < lists.length && res.length; i++) {
+      res = _intersectSorted(res, _decodeDeltas(lists[i]));
+    }
+    return res;
+  }
+
+  /**
+   * Return the indexed nodes (in the pre-order of the index), or null if
+   * nodes were added or removed since the index was set.
+   */
+  protected _getIndexedNodes(): WunderbaumNode[] | null {
+    if (
+      this.indexedNodes &&
+      this.indexedVersion !== this.tree._modifyVersion
+    ) {
+      this.tree.logWarn(
+        "Nodes were modified after setSearchIndex(): index dropped."
+      );
+      this.searchIndex = null;
+      this.indexedNodes = null;
+    }
+    return this.indexedNodes;
+  }
+
+  /**
+   * [ext-filter] Return nodes that may contain `query` in `field`, using the
+   * search index.
+   * This is a superset of the real matches (in current tree order), so
+   * callers should verify the result.
+   * Return null if no index is available for this query.
+   */
+  lookupSearchIndex(
+    query: string,
+    field: string = "title"
+  ): WunderbaumNode[] | null {
+    const indexes = this._lookupIndexes(query, field);
+    const nodeList = indexes ? this._getIndexedNodes() : null;
+    if (!indexes || !nodeList) {
+      return null;
+    }
+    // Nodes may have been sorted or moved since the index was set
+    return _sortByTreeOrder(indexes.map((idx) => nodeList[idx]));
+  }
+
   _applyFilterNoUpdate(
     filter: string | RegExp | NodeFilterCallback,
     _opts: FilterNodesOptions
@@ -193,6 +318,18 @@ export class FilterExtension extends WunderbaumExtension<FilterOptionsType> {
 
     let filterRegExp: RegExp;
     let highlightRegExp: RegExp;
+    // Only verify candidates found by the search index, if possible:
+    let candidates: WunderbaumNode[] | null = null;
+
+    if (
+      typeof filter === "string" &&
+      this.searchIndex &&
+      opts.useSearchIndex !== false &&
+      !opts.fuzzy &&
+      !matchBranch
+    ) {
+      candidates = this.lookupSearchIndex(filter);
+    }
 
     // Default to 'match title substring (case insensitive)'
     if (typeof filter === "string" || filter instanceof RegExp) {
@@ -275,18 +412,27 @@ export class FilterExtension extends WunderbaumExtension<FilterOptionsType> {
       !!opts.hideExpanders
     );
     // Reset current filter
-    tree.root.subMatchCount = 0;
-    tree.visit((node) => {
+    const resetNode = (node: WunderbaumNode) => {
       delete node.match;
       delete node.titleWithHighlight;
       node.subMatchCount = 0;
-    });
+    };
+    tree.root.subMatchCount = 0;
+    if (candidates && this.lastMatches) {
+      // Only the previous matches and their parents were modified
+      for (const node of this.lastMatches) {
+        node.visitParents(resetNode, true);
+      }
+    } else {
+      tree.visit(resetNode);
+    }
+    const matches: WunderbaumNode[] = [];
     tree.setStatus(NodeStatusType.ok);
 
     // Adjust node.hide, .match, and .subMatchCount properties
     treeOpts.autoCollapse = false; // #528
 
-    tree.visit((node) => {
+    const matchNode = (node: WunderbaumNode) => {
       if (leavesOnly && node.children != null) {
         return;
       }
@@ -308,9 +454,10 @@ export class FilterExtension extends WunderbaumExtension<FilterOptionsType> {
       if (res) {
         count++;
         node.match = count;
+        matches.push(node);
         node.visitParents((p) => {
           if (p !== node) {
-            p.subMatchCount! += 1;
+            p.subMatchCount = (p.subMatchCount ?? 0) + 1;
           }
           // Expand match (unless this is no real match, but only a node in a matched branch)
           if (opts.autoExpand && !matchedByBranch && !p.expanded) {
@@ -322,7 +469,15 @@ export class FilterExtension extends WunderbaumExtension<FilterOptionsType> {
           }
         }, true);
       }
-    });
+    };
+    if (candidates) {
+      // Candidates are in tree order, so `node.match` numbering is the same
+      tree.logDebug(`Search index returned ${candidates.length} candidates.`);
+      candidates.forEach(matchNode);
+    } else {
+      tree.visit(matchNode);
+    }
+    this.lastMatches = matches;
     treeOpts.autoCollapse = prevAutoCollapse;
 
     if (count === 0 && opts.noData && hideMode) {
@@ -428,6 +583,7 @@ export class FilterExtension extends WunderbaumExtension<FilterOptionsType> {
     });
     tree.filterMode = null;
     this.lastFilterArgs = null;
+    this.lastMatches = [];
     tree.element.classList.remove(
       // "wb-ext-filter",
       "wb-ext-filter-dim",
@@ -439,6 +595,65 @@ export class FilterExtension extends WunderbaumExtension<FilterOptionsType> {
   }
 }
 
+/** Sort nodes by their current position in the tree (pre-order). */
+function _sortByTreeOrder(nodes: WunderbaumNode[]): WunderbaumNode[] {
+  // Sibling index per node (filled for whole child lists on demand)
+  const siblingIdx = new Map<WunderbaumNode, number>();
+  const pathMap = new Map<WunderbaumNode, number[]>();
+
+  for (const node of nodes) {
+    const path: number[] = [];
+    for (let n = node; n.parent; n = n.parent) {
+      if (!siblingIdx.has(n)) {
+        n.parent.children!.forEach((c, i) => siblingIdx.set(c, i));
+      }
+      path.push(siblingIdx.get(n)!);
+    }
+    pathMap.set(node, path.reverse());
+  }
+  return nodes.sort((a, b) => {
+    const pa = pathMap.get(a)!;
+    const pb = pathMap.get(b)!;
+    const len = Math.min(pa.length, pb.length);
+    for (let i = 0; i < len; i++) {
+      if (pa[i] !== pb[i]) {
+        return pa[i] - pb[i];
+      }
+    }
+    return pa.length - pb.length; // Parents come before their descendants
+  });
+}
+
+/** Decode a delta-encoded list of ascending numbers. */
+function _decodeDeltas(deltas: number[]): number[] {
+  const res = new Array<number>(deltas.length);
+  let prev = 0;
+  for (let i = 0; i < deltas.length; i++) {
+    prev += deltas[i];
+    res[i] = prev;
+  }
+  return res;
+}
+
+/** Return the intersection of two ascending number lists. */
+function _intersectSorted(a: number[], b: number[]): number[] {
+  const res: number[] = [];
+  let i = 0,
+    j = 0;
+  while (i < a.length && j < b.length) {
+    if (a[i] === b[j]) {
+      res.push(a[i]);
+      i++;
+      j++;
+    } else if (a[i] < b[j]) {
+      i++;
+    } else {
+      j++;
+    }
+  }
+  return res;
+}
+
 /**
  * @description Marks the matching characters of `text` either by `mark` or
  * by exotic*Chars (if `escapeTitles` is `true`) based on `matches`
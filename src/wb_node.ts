@@ -6,6 +6,7 @@
 
 import * as util from "./util";
 
+import { decodeBinarySource, isBinaryResponse } from "./binary_format";
 import { Wunderbaum } from "./wunderbaum";
 import {
   AddChildrenOptions,
@@ -27,6 +28,7 @@ import {
   NodeToDictCallback,
   NodeVisitCallback,
   NodeVisitResponse,
+  PrefetchChunkType,
   RenderOptions,
   ResetOrderOptions,
   ScrollIntoViewOptions,
@@ -37,6 +39,7 @@ import {
   SortByPropertyOptions,
   SortCallback,
   SortOptions,
+  SourceListType,
   SourceType,
   TooltipOption,
   TristateType,
@@ -46,11 +49,14 @@ import {
 import {
   decompressSourceData,
   ICON_WIDTH,
+  isNdjsonResponse,
   KEY_TO_NAVIGATION_MAP,
   makeNodeTitleMatcher,
   NODE_TYPE_FOLDER,
   nodeTitleSorter,
+  readNdjsonStream,
   RESERVED_TREE_SOURCE_KEYS,
+  SORT_RANK_PREFIX,
   TEST_FILE_PATH,
   TEST_HTML,
   TITLE_SPAN_PAD_Y,
@@ -84,6 +90,15 @@ const NODE_DICT_PROPS = new Set<string>(NODE_PROPS);
 NODE_DICT_PROPS.delete("_partsel");
 NODE_DICT_PROPS.delete("unselectable");
 
+/** Make prefetch chunk URLs absolute (they are relative to the payload URL). */
+function _resolvePrefetchUrls(source: any, response: Response): void {
+  if (source?._prefetch && response.url) {
+    for (const chunk of <PrefetchChunkType[]>source._prefetch) {
+      chunk.url = new URL(chunk.url, response.url).href;
+    }
+  }
+}
+
 // /** Node properties that are of type bool (or boolean & string).
 //  *  When parsing, we accept 0 for false and 1 for true for better JSON compression.
 //  */
@@ -337,7 +352,7 @@ export class WunderbaumNode {
       const forceExpand =
         applyMinExpanLevel && _level < tree.options.minExpandLevel;
       for (const child of <WbNodeData[]>nodeData) {
-        const subChildren = child.children;
+        let subChildren = child.children;
         // Remove children property from source data because it should not be
         // passed to the constructor of WunderbaumNode:
         delete child.children;
@@ -347,6 +362,14 @@ export class WunderbaumNode {
         // Set `children` property again, so it can be used in `reload()`
         if (subChildren != null) {
           child.children = subChildren;
+        } else if (n.refKey != null && tree["_templateMap"].has(n.refKey)) {
+          // Child nodes are created from a shared subtree template, when the
+          // node is expanded. (Expanded nodes are loaded after the source was
+          // processed, so pre-order indexes only count the source nodes.)
+          n.lazy = true;
+          if (forceExpand) {
+            n.expanded = true;
+          }
         }
         if (forceExpand && !n.isUnloaded()) {
           n.expanded = true;
@@ -1083,7 +1106,11 @@ export class WunderbaumNode {
     return true;
   }
 
-  protected _loadSourceObject(source: any, level?: number) {
+  protected _loadSourceObject(
+    source: any,
+    level?: number,
+    requestSource?: SourceType
+  ) {
     const tree = this.tree;
 
     level ??= this.getLevel();
@@ -1096,6 +1123,8 @@ export class WunderbaumNode {
 
     if (util.isArray(source)) {
       source = { children: source };
+    } else if (source instanceof ArrayBuffer) {
+      source = decodeBinarySource(source);
     }
     util.assert(
       util.isPlainObject(source),
@@ -1115,6 +1144,35 @@ export class WunderbaumNode {
       source.children,
       "If `source` is an object, it must have a `children` property"
     );
+    this._loadSourceHeader(source);
+
+    const prevChildCount = this.children?.length ?? 0;
+    this.addChildren(source.children);
+
+    this._loadSourceFinish(source, prevChildCount, requestSource);
+  }
+
+  /**
+   * Apply `source.types`, `source.columns`, and register `source._templates`
+   * (called before adding nodes).
+   */
+  protected _loadSourceHeader(source: any) {
+    const tree = this.tree;
+
+    if (source._templates) {
+      for (const [refKey, childList] of Object.entries(source._templates)) {
+        tree["_templateMap"].set(refKey, <SourceListType>childList);
+      }
+    }
+    if (source._prefetch) {
+      for (const chunk of <PrefetchChunkType[]>source._prefetch) {
+        for (const key of chunk.keys) {
+          const dfd = new Deferred<SourceListType>();
+          dfd.catch(util.noop); // Errors are reported by `loadLazy()`
+          tree["_prefetchMap"].set(key, dfd);
+        }
+      }
+    }
     if (source.types) {
       tree.logInfo("Redefine types", source.columns);
       tree.setTypes(source.types, false);
@@ -1126,8 +1184,31 @@ export class WunderbaumNode {
       delete source.columns;
       tree.update(ChangeType.colStructure);
     }
+  }
 
-    this.addChildren(source.children);
+  /**
+   * Apply precomputed data and extra source properties, then send `load`.
+   * `requestSource` is the `load()` argument, if the source was fetched.
+   */
+  protected _loadSourceFinish(
+    source: any,
+    prevChildCount: number,
+    requestSource?: SourceType
+  ) {
+    const tree = this.tree;
+
+    if (source._sortRanks) {
+      // Store as `node.data._sortRank_PROPNAME`, so `sort()` can use it
+      const rankMap: { [propName: string]: Array<number> } = {};
+      for (const [propName, ranks] of Object.entries(source._sortRanks)) {
+        rankMap[SORT_RANK_PREFIX + propName] = ranks;
+      }
+      this._applyPreOrderData(rankMap, prevChildCount);
+    }
+    if (source._nodeData) {
+      this._applyPreOrderData(source._nodeData, prevChildCount);
+    }
+    this._expandTemplateRefs(this.children?.slice(prevChildCount) ?? []);
 
     // Add extra data to `tree.data`
     for (const [key, value] of Object.entries(source)) {
@@ -1142,10 +1223,272 @@ export class WunderbaumNode {
     // Allow to un-sort nodes after sorting
     this.resetNativeChildOrder();
 
+    if (source._prefetch) {
+      // Don't wait: placeholders are loaded when their chunk arrives
+      this._loadPrefetchChunks(source._prefetch, requestSource);
+    }
     this._callEvent("load");
   }
 
-  async _fetchWithOptions(source: any) {
+  /**
+   * Fetch the chunks of a prefetch manifest one by one (in priority order)
+   * and pass the child lists to the lazy placeholder nodes.
+   * Expanded placeholders are loaded immediately, the others when they are
+   * expanded.
+   */
+  protected async _loadPrefetchChunks(
+    manifest: PrefetchChunkType[],
+    requestSource?: SourceType
+  ) {
+    const tree = this.tree;
+    const prefetchMap = tree["_prefetchMap"];
+    // Request chunks like the payload (e.g. with the same credentials)
+    const { params, options } = util.isPlainObject(requestSource)
+      ? <any>requestSource
+      : <any>{};
+    // Ignore results for placeholders that were removed in the meantime
+    // (e.g. the tree was reloaded)
+    const pending = new Map<string, Deferred<SourceListType>>();
+    for (const chunk of manifest) {
+      for (const key of chunk.keys) {
+        pending.set(key, prefetchMap.get(key)!);
+      }
+    }
+
+    for (const chunk of manifest) {
+      try {
+        const response = await this._fetchResponse({
+          url: chunk.url,
+          params: params,
+          options: { ...options, method: "GET" },
+        });
+        const data = await response.json();
+        decompressSourceData(data);
+
+        for (const { key, children } of <WbNodeData[]>data.children) {
+          const dfd = pending.get(key!);
+          if (!dfd || prefetchMap.get(key!) !== dfd) {
+            continue;
+          }
+          dfd.resolve(children ?? []);
+          const node = tree.findKey(key!);
+          if (node && node.expanded && node.isUnloaded()) {
+            node.loadLazy(); // Resolves immediately
+          }
+        }
+      } catch (error) {
+        tree.logError(`Error loading prefetch chunk ${chunk.url}`, error);
+        for (const key of chunk.keys) {
+          pending.get(key)?.reject(error);
+        }
+      }
+    }
+  }
+
+  /**
+   * Create the children of expanded nodes (in the given subtrees) that
+   * reference a subtree template.
+   */
+  protected _expandTemplateRefs(nodes: WunderbaumNode[]): void {
+    const templateMap = this.tree["_templateMap"];
+    if (!templateMap.size) {
+      return;
+    }
+    const pending: WunderbaumNode[] = [];
+    const collect = (node: WunderbaumNode) => {
+      if (
+        node.refKey != null &&
+        node.expanded &&
+        node.isUnloaded() &&
+        templateMap.has(node.refKey)
+      ) {
+        pending.push(node);
+      }
+    };
+    nodes.forEach((node) => node.visit(collect, true));
+    // Templates may contain expanded references, too
+    while (pending.length) {
+      const node = pending.pop()!;
+      node.addChildren(templateMap.get(node.refKey!)!);
+      node.visit(collect);
+    }
+  }
+
+  /**
+   * Assign parallel value arrays (e.g. `source._sortRanks` or
+   * `source._nodeData`) to `node.data[PROPNAME]`.
+   * Arrays are indexed in pre-order, starting with the first new child.
+   * `null` entries are skipped.
+   */
+  protected _applyPreOrderData(
+    dataMap: { [propName: string]: Array<any> },
+    startChildIdx = 0
+  ): void {
+    const entries = Object.entries(dataMap);
+    const children = this.children ?? [];
+    let idx = 0;
+
+    for (let i = startChildIdx; i < children.length; i++) {
+      children[i].visit((node) => {
+        for (const [propName, values] of entries) {
+          const value = values[idx];
+          if (value != null) {
+            node.data[propName] = value;
+          }
+        }
+        idx++;
+      }, true);
+    }
+    for (const [propName, values] of entries) {
+      if (values.length !== idx) {
+        this.logWarn(
+          `Expected ${idx} pre-order entries for ${propName}, got ${values.length}`
+        );
+      }
+    }
+  }
+
+  /**
+   * Load a newline-delimited JSON stream (`ndjson` format), i.e. one header
+   * line, followed by one flat node tuple per line.
+   * Nodes are added in batches while the response is still arriving.
+   */
+  protected async _loadNdjsonStream(
+    response: Response,
+    requestId: number,
+    requestSource?: SourceType
+  ) {
+    const tree = this.tree;
+    const prevChildCount = this.children?.length ?? 0;
+    // Created nodes by tuple index, so later batches can reference parents
+    const indexToNode: WunderbaumNode[] = [];
+    let header: any = null;
+    let positionalShort: string[] = [];
+    let keyAttrName = "key";
+    let childrenAttrName = "children";
+
+    const _addBatch = (lines: any[]): boolean => {
+      if (this._requestId !== requestId) {
+        this.logWarn(`Canceled NDJSON stream #${requestId}.`);
+        return false;
+      }
+      let start = 0;
+      if (header === null) {
+        header = lines[0];
+        start = 1;
+        // Let caller modify the header line:
+        const res = this._callEvent("receive", { response: header });
+        if (res != null) {
+          header = res;
+        }
+        util.assert(
+          header._format === "ndjson",
+          `Expected source._format: "ndjson", but got ${header._format}`
+        );
+        const longToShort = header._keyMap ?? {};
+        positionalShort = (header._positional ?? []).map(
+          (e: string) => longToShort[e] ?? e
+        );
+        keyAttrName = longToShort["key"] ?? "key";
+        childrenAttrName = longToShort["children"] ?? "children";
+        if (header._templates) {
+          decompressSourceData({
+            _keyMap: header._keyMap,
+            _valueMap: header._valueMap,
+            _templates: header._templates,
+            children: [],
+          });
+        }
+        _resolvePrefetchUrls(header, response);
+        this._loadSourceHeader(header);
+      }
+
+      // Convert tuples to nested dicts. Parents from previous batches are
+      // already WunderbaumNodes, so the top dicts of this batch are collected
+      // as `[parentNode, dict]`:
+      const batchStart = indexToNode.length;
+      const batchDicts: any[] = [];
+      const batchKeyMap: { [key: string]: any } = {};
+      const roots: Array<[WunderbaumNode, any]> = [];
+
+      for (let i = start; i < lines.length; i++) {
+        const [parentId, ...args] = lines[i];
+        let kwargs: any = {};
+        if (args.length === positionalShort.length + 1) {
+          kwargs = args.pop();
+        } else if (args.length !== positionalShort.length) {
+          util.error(`NDJSON: unexpected tuple length: ${lines[i]}`);
+        }
+        args.forEach((val: any, positionalIdx: number) => {
+          kwargs[positionalShort[positionalIdx]] = val;
+        });
+        batchDicts.push(kwargs);
+        if (kwargs[keyAttrName] != null) {
+          batchKeyMap[kwargs[keyAttrName]] = kwargs;
+        }
+
+        let parentDict = null;
+        let parentNode: WunderbaumNode | null = null;
+        if (parentId === null) {
+          parentNode = this;
+        } else if (typeof parentId === "number") {
+          if (parentId >= batchStart) {
+            parentDict = batchDicts[parentId - batchStart];
+          } else {
+            parentNode = indexToNode[parentId];
+          }
+        } else {
+          parentDict = batchKeyMap[parentId];
+          parentNode = parentDict ? null : tree.findKey(parentId);
+        }
+        if (parentDict) {
+          parentDict[childrenAttrName] ??= [];
+          parentDict[childrenAttrName].push(kwargs);
+        } else if (parentNode) {
+          roots.push([parentNode, kwargs]);
+        } else {
+          util.error(`NDJSON: could not find parent node: ${parentId}`);
+        }
+      }
+      // Expand short names and value indexes (modifies dicts in-place)
+      decompressSourceData({
+        _keyMap: header._keyMap,
+        _valueMap: header._valueMap,
+        children: roots.map((r) => r[1]),
+      });
+
+      tree.runWithDeferredUpdate(() => {
+        // Add runs of siblings with one call, then register all new nodes in
+        // tuple (i.e. pre-order) order
+        const rootNodes: WunderbaumNode[] = [];
+        for (let i = 0; i < roots.length; ) {
+          const parentNode = roots[i][0];
+          const run = [];
+          while (i < roots.length && roots[i][0] === parentNode) {
+            run.push(roots[i][1]);
+            i++;
+          }
+          parentNode.addChildren(run);
+          rootNodes.push(...parentNode.children!.slice(-run.length));
+        }
+        for (const node of rootNodes) {
+          node.visit((n) => {
+            indexToNode.push(n);
+          }, true);
+        }
+      });
+      return true;
+    };
+
+    const completed = await readNdjsonStream(response, _addBatch);
+    if (completed) {
+      util.assert(header, "NDJSON stream did not contain a header line.");
+      this._loadSourceFinish(header, prevChildCount, requestSource);
+    }
+  }
+
+  /** Start a fetch request and return the response. */
+  protected async _fetchResponse(source: any): Promise<Response> {
     // Either a URL string or an object with a `.url` property.
     let url: string, params, body, options, rest;
     let fetchOpts: RequestInit = {};
@@ -1183,13 +1526,13 @@ export class WunderbaumNode {
       url = ""; // keep linter happy
       util.error(`Unsupported source format: ${source}`);
     }
-    this.setStatus(NodeStatusType.loading);
     const response = await fetch(url, fetchOpts);
     if (!response.ok) {
       util.error(`GET ${url} returned ${response.status}, ${response}`);
     }
-    return await response.json();
+    return response;
   }
+
   /** Download  data from the cloud, then call `.update()`. */
   async load(source: SourceType) {
     const tree = this.tree;
@@ -1226,7 +1569,20 @@ export class WunderbaumNode {
         elapProcess = Date.now() - start;
       } else {
         // Either a URL string or an object with a `.url` property.
-        const data = await this._fetchWithOptions(source);
+        this.setStatus(NodeStatusType.loading);
+        const response = await this._fetchResponse(source);
+        // NDJSON is processed while loading, so `elapLoad` is the time to
+        // the first byte in this case:
+        const streaming = isNdjsonResponse(url, response);
+        let data = null;
+        if (streaming) {
+          // Processed below
+        } else if (isBinaryResponse(url, response)) {
+          data = await response.arrayBuffer();
+        } else {
+          data = await response.json();
+          _resolvePrefetchUrls(data, response);
+        }
 
         elapLoad = Date.now() - start;
 
@@ -1253,7 +1609,11 @@ export class WunderbaumNode {
         //   tree.updateColumns({ calculateCols: false });
         // }
         const startProcess = Date.now();
-        this._loadSourceObject(data);
+        if (streaming) {
+          await this._loadNdjsonStream(response, requestId, source);
+        } else {
+          this._loadSourceObject(data, undefined, source);
+        }
         elapProcess = Date.now() - startProcess;
       }
     } catch (error) {
@@ -1298,7 +1658,19 @@ export class WunderbaumNode {
     // will reset the status later.
     this.setStatus(NodeStatusType.loading);
     try {
-      const source = await this._callEvent("lazyLoad");
+      // Nodes that reference a subtree template don't need a request:
+      const template =
+        this.refKey != null
+          ? this.tree["_templateMap"].get(this.refKey)
+          : undefined;
+      // Placeholders of a 'first paint' payload wait for their prefetch chunk:
+      const prefetched = this.tree["_prefetchMap"].get(this.key);
+      const source =
+        template ??
+        (prefetched
+          ? await prefetched.promise()
+          : await this._callEvent("lazyLoad"));
+      this.tree["_prefetchMap"].delete(this.key);
       if (source === false) {
         this.setStatus(NodeStatusType.ok);
         return;
@@ -2692,6 +3064,9 @@ export class WunderbaumNode {
   /** Rename this node. */
   setTitle(title: string): void {
     this.title = title;
+    // Precomputed sort ranks are stale now (siblings fall back to comparing)
+    delete this.data[SORT_RANK_PREFIX + "title"];
+    this.tree._modifyVersion++; // Search index is stale, too
     this.update();
     // this.triggerModify("rename"); // TODO
   }
@@ -2763,6 +3138,7 @@ export class WunderbaumNode {
       updateColInfo = false,
       nativeOrderPropName = "_nativeIndex",
       colId = undefined,
+      useSortRanks = true,
     } = options;
 
     propName ??= colId;
@@ -2797,6 +3173,18 @@ export class WunderbaumNode {
     this.logDebug(`sort(), propName=${propName}, ${order}`, options);
     util.assert(propName || cmp || key, "No `propName` or `key` specified");
 
+    // Precomputed sibling ranks allow to sort by a linear reorder.
+    // `_nativeIndex` is such a rank, so restoring the native order also
+    // benefits:
+    let rankPropName: string | null = null;
+    if (useSortRanks && key == null && cmp == null && !isFolder) {
+      if (propName === nativeOrderPropName) {
+        rankPropName = propName;
+      } else if (caseInsensitive) {
+        rankPropName = SORT_RANK_PREFIX + propName;
+      }
+    }
+
     // Define a key callback from the parameters we have
     if (key == null && cmp == null) {
       key = (node) => {
@@ -2852,11 +3240,50 @@ export class WunderbaumNode {
       };
     }
 
+    // Reorder in-place, using `node.data[rankPropName]` as target index.
+    // Return false (and leave `cl` unchanged) if ranks are missing or stale.
+    function _reorderByRank(cl: WunderbaumNode[]): boolean {
+      const n = cl.length;
+      const res = new Array<WunderbaumNode>(n);
+      const desc = order === "desc";
+
+      for (let i = 0; i < n; i++) {
+        const rank = cl[i].data[rankPropName!];
+        if (typeof rank !== "number" || rank < 0 || rank >= n) {
+          return false;
+        }
+        const target = desc ? n - 1 - rank : rank;
+        if (res[target] !== undefined) {
+          return false; // Not a permutation
+        }
+        res[target] = cl[i];
+      }
+      if (desc) {
+        // Like the stable comparison sort, siblings with equal values must
+        // keep their order, so un-reverse runs of ties
+        let start = 0;
+        for (let i = 1; i <= n; i++) {
+          if (i === n || cmp!(res[i - 1], res[i]) !== 0) {
+            for (let lo = start, hi = i - 1; lo < hi; lo++, hi--) {
+              [res[lo], res[hi]] = [res[hi], res[lo]];
+            }
+            start = i;
+          }
+        }
+      }
+      for (let i = 0; i < n; i++) {
+        cl[i] = res[i];
+      }
+      return true;
+    }
+
     function _sortChildren(cl: WunderbaumNode[]): void {
       if (!cl) {
         return;
       }
-      cl.sort(cmp);
+      if (!rankPropName || !_reorderByRank(cl)) {
+        cl.sort(cmp);
+      }
       if (deep) {
         for (let i = 0, l = cl.length; i < l; i++) {
           if (cl[i].children) {
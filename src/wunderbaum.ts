@@ -47,6 +47,7 @@ import {
   SetStateOptions,
   SetStatusOptions,
   SortCallback,
+  SourceListType,
   SourceType,
   TreeStateDefinition,
   UpdateOptions,
@@ -61,8 +62,10 @@ import {
   SortByPropertyOptions,
   ReloadOptions,
   LoadLazyNodesOptions,
+  SearchIndexType,
 } from "./types";
 import {
+  decompressSourceData,
   DEFAULT_DEBUGLEVEL,
   defaultIconMaps,
   makeNodeTitleStartMatcher,
@@ -72,6 +75,7 @@ import {
   TEST_FILE_PATH,
   TEST_HTML,
 } from "./common";
+import { decodeBinarySource } from "./binary_format";
 import { WunderbaumNode } from "./wb_node";
 import { Deferred } from "./deferred";
 import { EditExtension } from "./wb_ext_edit";
@@ -120,6 +124,15 @@ export class Wunderbaum {
   protected readonly _updateViewportThrottled: DebouncedFunction<() => void>;
   protected extensionList: WunderbaumExtension<any>[] = [];
   protected extensions: ExtensionsDict = <ExtensionsDict>{};
+  /** Shared child lists of repeated subtrees (`source._templates`). */
+  protected _templateMap = new Map<string, SourceListType>();
+  /** Pending child lists of placeholder nodes by key (`source._prefetch`). */
+  protected _prefetchMap = new Map<string, Deferred<SourceListType>>();
+  /**
+   * Incremented whenever nodes (except status nodes) are added or removed, or
+   * node titles or cell values are changed (drops the search index). @internal
+   */
+  _modifyVersion = 0;
 
   /** Merged options from constructor args and tree- and extension defaults. */
   public options: WunderbaumOptions;
@@ -163,6 +176,11 @@ export class Wunderbaum {
   public readonly ready: Promise<any>;
   /** Expose some useful methods of the util.ts module as `Wunderbaum.util`. */
   public static util = util;
+  /**
+   * Expose the source format converters as `Wunderbaum.sourceUtil`, e.g. to
+   * benchmark decoding independently from node creation.
+   */
+  public static sourceUtil = { decodeBinarySource, decompressSourceData };
   /** A map of default iconMaps.
    * May be used as default, when passing partial icon definition maps:
    * ```js
@@ -751,6 +769,9 @@ export class Wunderbaum {
     util.assert(key != null, `Missing key: '${node}'.`);
     util.assert(!this.keyMap.has(key), `Duplicate key: '${key}': ${node}.`);
     this.keyMap.set(key, node);
+    if (!node.statusNodeType) {
+      this._modifyVersion++;
+    }
     const rk = node.refKey;
     if (rk != null) {
       const rks = this.refKeyMap.get(rk); // Set of nodes with this refKey
@@ -775,6 +796,9 @@ export class Wunderbaum {
     }
     // Remove key reference from map
     this.keyMap.delete(node.key);
+    if (!node.statusNodeType) {
+      this._modifyVersion++;
+    }
     // Mark as disposed
     (node.tree as any) = null;
     (node.parent as any) = null;
@@ -1096,6 +1120,8 @@ export class Wunderbaum {
     this.root.children = null;
     this.keyMap.clear();
     this.refKeyMap.clear();
+    this._templateMap.clear();
+    this._prefetchMap.clear();
     this.treeRowCount = 0;
     this._activeNode = null;
     this._focusNode = null;
@@ -3200,4 +3226,35 @@ export class Wunderbaum {
   updateFilter() {
     return this.extensions.filter.updateFilter();
   }
+
+  /**
+   * Use a prebuilt n-gram search index for string filters (pass null to remove).
+   *
+   * Node indexes in the search index refer to the depth-first, pre-order
+   * position of a node (i.e. the order of the flat source format).
+   * The index is ignored if the node count does not match.
+   * Set it after loading and before sorting or moving nodes; adding or
+   * removing nodes, or changing titles or cell values later drops the index.
+   * @example
+   * ```ts
+   * const response = await fetch("tree_store_XL_t_c_index.json");
+   * tree.setSearchIndex(await response.json());
+   * tree.filterNodes("foo", {});  // Only verifies candidate nodes
+   * ```
+   * @since 0.14.2
+   */
+  setSearchIndex(index: SearchIndexType | null): void {
+    this.extensions.filter.setSearchIndex(index);
+  }
+
+  /**
+   * Return nodes that may contain `query` in `field`, using the search index.
+   * The result may contain false positives, so callers should verify it.
+   * Return null if no index is available for this query.
+   * @see {@link Wunderbaum.setSearchIndex}
+   * @since 0.14.2
+   */
+  lookupSearchIndex(query: string, field?: string): WunderbaumNode[] | null {
+    return this.extensions.filter.lookupSearchIndex(query, field);
+  }
 }
@@ -0,0 +1,248 @@
+"""
+Encode a tree as compact binary source (Wunderbaum binary tree, `*.wbt`).
+
+This format avoids the JSON overhead of punctuation, quoted keys, and decimal
+numbers. It is decoded by `src/binary_format.ts`.
+
+Layout (all numbers little-endian):
+
+- Magic `b"WBT"` and format version (1 byte)
+- Header length (uint32) and UTF-8 JSON header.
+  Contains `nodeCount`, `fields` (list of `[NAME, KIND]`), and additional
+  source properties like `types` and `columns`.
+- String table: count (varint), then for each string its byte length (varint)
+  and UTF-8 bytes. All string values are stored as index into this table, so
+  repeated values (e.g. node types) are only stored once.
+- Parent deltas: one varint per node: `0` for top-level nodes, otherwise the
+  distance to the parent's index (nodes are stored in pre-order).
+- Presence bitmap: `ceil(len(fields) / 8)` bytes per node. Bit `f` is set if
+  the node has a value for `fields[f]`.
+- One column per field, containing the values of all nodes that have the
+  bit set, in node order:
+    - `str`: string table index (varint)
+    - `int`: zigzag-encoded varint
+    - `float`: float64
+    - `bool`: one byte (0 or 1)
+    - `json`: string table index of the JSON-encoded value (fallback)
+"""
+
+import json
+import struct
+
+MAGIC = b"WBT"
+BINARY_FORMAT_VERSION = 1
+
+
+def iter_pre_order(child_list: list):
+    """Yield `(parent_idx, node)` in depth-first pre-order."""
+    # Don't import `generator`, so this module does not depend on nutree
+    stack = [(None, child_list, 0)]
+    idx = 0
+    while stack:
+        parent_idx, nodes, i = stack.pop()
+        if i >= len(nodes):
+            continue
+        node = nodes[i]
+        stack.append((parent_idx, nodes, i + 1))
+        yield parent_idx, node
+        if node.get("children"):
+            stack.append((idx, node["children"], 0))
+        idx += 1
+
+
+def _field_kind(values: list) -> str:
+    """Return the narrowest column kind that can store all `values`."""
+    types = {type(v) for v in values}
+    if types == {bool}:
+        return "bool"
+    if types == {int}:
+        return "int"
+    if types <= {int, float}:
+        return "float"
+    if types == {str}:
+        return "str"
+    return "json"
+
+
+def _encode_varint(n: int, out: bytearray) -> None:
+    if n < 0:
+        raise ValueError(f"Expected unsigned int: {n}")
+    while True:
+        b = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(b | 0x80)
+        else:
+            out.append(b)
+            return
+
+
+def _zigzag(n: int) -> int:
+    return n * 2 if n >= 0 else -n * 2 - 1
+
+
+def encode_binary_source(
+    child_list: list,
+    *,
+    types: dict | None = None,
+    columns: list | None = None,
+    extra: dict | None = None,
+) -> bytes:
+    """
+    Return `child_list` (uncompressed, nested format) as binary source.
+
+    `extra` may contain additional source properties (e.g. `_sortRanks` or
+    `_nodeData`) that are stored in the JSON header.
+    """
+    parent_list = []
+    node_list = []
+    field_values = {}  # Keeps insertion order
+    for parent_idx, node in iter_pre_order(child_list):
+        parent_list.append(parent_idx)
+        node_list.append(node)
+        for name, value in node.items():
+            if name != "children" and value is not None:
+                field_values.setdefault(name, []).append(value)
+
+    fields = [(name, _field_kind(values)) for name, values in field_values.items()]
+
+    header = {
+        "nodeCount": len(node_list),
+        "fields": fields,
+        "types": types,
+        "columns": columns,
+    }
+    header.update(extra or {})
+    header = {k: v for k, v in header.items() if v is not None}
+
+    #: Map string -> index
+    string_map = {}
+
+    def _str_idx(s: str) -> int:
+        idx = string_map.get(s)
+        if idx is None:
+            idx = string_map[s] = len(string_map)
+        return idx
+
+    # Parent deltas and presence bitmap
+    body = bytearray()
+    for idx, parent_idx in enumerate(parent_list):
+        _encode_varint(0 if parent_idx is None else idx - parent_idx, body)
+
+    bitmap_width = (len(fields) + 7) // 8
+    for node in node_list:
+        bits = 0
+        for f, (name, _kind) in enumerate(fields):
+            if node.get(name) is not None:
+                bits |= 1 << f
+        body += bits.to_bytes(bitmap_width, "little")
+
+    # Value columns
+    pack_float = struct.Struct("<d").pack
+    for name, kind in fields:
+        for node in node_list:
+            value = node.get(name)
+            if value is None:
+                continue
+            if kind == "str":
+                _encode_varint(_str_idx(value), body)
+            elif kind == "int":
+                _encode_varint(_zigzag(value), body)
+            elif kind == "float":
+                body += pack_float(float(value))
+            elif kind == "bool":
+                body.append(1 if value else 0)
+            else:
+                s = json.dumps(value, separators=(",", ":"))
+                _encode_varint(_str_idx(s), body)
+
+    # String table
+    strings = bytearray()
+    _encode_varint(len(string_map), strings)
+    for s in string_map.keys():  # dict preserves insertion (i.e. index) order
+        b = s.encode("utf-8")
+        _encode_varint(len(b), strings)
+        strings += b
+
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    return b"".join(
+        (
+            MAGIC,
+            bytes([BINARY_FORMAT_VERSION]),
+            struct.pack("<I", len(header_bytes)),
+            header_bytes,
+            strings,
+            body,
+        )
+    )
+
+
+def decode_binary_source(data: bytes) -> dict:
+    """
+    Return a source dict `{..., "children": [...]}` in nested format.
+
+    This is the Python equivalent of `decodeBinarySource()` in
+    `src/binary_format.ts` and is used to verify round trips.
+    """
+    if data[:3] != MAGIC:
+        raise ValueError("Not a Wunderbaum binary tree (invalid magic)")
+    if data[3] != BINARY_FORMAT_VERSION:
+        raise ValueError(f"Unsupported binary format version {data[3]}")
+    (header_len,) = struct.unpack_from("<I", data, 4)
+    pos = 8 + header_len
+    header = json.loads(data[8:pos].decode("utf-8"))
+
+    def _read_varint() -> int:
+        nonlocal pos
+        res = shift = 0
+        while True:
+            b = data[pos]
+            pos += 1
+            res |= (b & 0x7F) << shift
+            if b < 0x80:
+                return res
+            shift += 7
+
+    strings = []
+    for _ in range(_read_varint()):
+        length = _read_varint()
+        strings.append(data[pos : pos + length].decode("utf-8"))
+        pos += length
+
+    node_count = header.pop("nodeCount")
+    fields = header.pop("fields")
+    node_list = [{} for _ in range(node_count)]
+    children = []
+    for idx in range(node_count):
+        delta = _read_varint()
+        if delta:
+            node_list[idx - delta].setdefault("children", []).append(node_list[idx])
+        else:
+            children.append(node_list[idx])
+
+    bitmap_width = (len(fields) + 7) // 8
+    bitmap_pos = pos
+    pos += node_count * bitmap_width
+
+    for f, (name, kind) in enumerate(fields):
+        byte_ofs, mask = f >> 3, 1 << (f & 7)
+        for idx, node in enumerate(node_list):
+            if not data[bitmap_pos + idx * bitmap_width + byte_ofs] & mask:
+                continue
+            if kind == "str":
+                value = strings[_read_varint()]
+            elif kind == "int":
+                n = _read_varint()
+                value = (n >> 1) ^ -(n & 1)
+            elif kind == "float":
+                (value,) = struct.unpack_from("<d", data, pos)
+                pos += 8
+            elif kind == "bool":
+                value = bool(data[pos])
+                pos += 1
+            else:
+                value = json.loads(strings[_read_varint()])
+            node[name] = value
+
+    header["children"] = children
+    return header
@@ -0,0 +1,268 @@
+/*
+ * Measure the client-side load cost of generated fixture files.
+ *
+ * Usage:
+ *   node decode_bench.mjs [--bundle PATH] [--runs N] FILE [FILE ...]
+ *
+ * Every FILE (`.json`, `.ndjson`, or `.wbt`) is loaded by the Wunderbaum
+ * bundle (default: `dist/wunderbaum.umd.js`) in headless Chrome, which is
+ * controlled by this Node.js process via puppeteer.
+ * (The bundle requires `document` and `navigator`, so it cannot run in plain
+ * Node.js.)
+ *
+ * The following phases are measured separately:
+ *   - fetchMs: Read the response body from a local HTTP server
+ *   - parseMs: `JSON.parse()` (`null` for binary files)
+ *   - decodeMs: `Wunderbaum.sourceUtil.decompressSourceData()` (including
+ *     `unflattenSource()`) or `decodeBinarySource()`
+ *   - buildMs: `tree.load()`, i.e. node creation and first render
+ *     (for 'first paint' payloads this does not include the prefetch chunks)
+ *   - prefetchMs: 'first paint' payloads only: time until all prefetch chunks
+ *     have arrived (after `tree.load()` returned)
+ *   - heapBytes: JS heap growth after garbage collection, while the tree is
+ *     still alive (including prefetched chunks)
+ *
+ * NDJSON files are loaded like in production, i.e. streamed by
+ * `tree.load(url)`. Fetching, parsing, and decoding are done batch by batch,
+ * so they are included in buildMs (time to completion), and firstBatchMs is
+ * the time until the first batch was received (`receive` event).
+ *
+ * Times are the minimum of `--runs` runs, each in a fresh page.
+ * The results are written as JSON list to stdout, progress to stderr.
+ * This script is called by `python make_fixture.py NAME --bench`.
+ */
+import fs from "node:fs";
+import http from "node:http";
+import path from "node:path";
+import { fileURLToPath } from "node:url";
+import puppeteer from "puppeteer";
+
+const ROOT_DIR = path.resolve(
+  path.dirname(fileURLToPath(import.meta.url)),
+  "../.."
+);
+
+const CONTENT_TYPES = {
+  ".js": "text/javascript",
+  ".json": "application/json",
+  ".ndjson": "application/x-ndjson",
+  ".wbt": "application/x-wunderbaum-tree",
+};
+
+const PAGE_HTML = `<!DOCTYPE html>
+<html><body>
+<div id="tree" style="height: 600px; width: 800px;"></div>
+<script src="/bundle.js"></script>
+</body></html>`;
+
+function parseArgs(argv) {
+  const opts = {
+    bundle: path.join(ROOT_DIR, "dist/wunderbaum.umd.js"),
+    runs: 3,
+    files: [],
+  };
+  for (let i = 0; i < argv.length; i++) {
+    const arg = argv[i];
+    if (arg === "--bundle") {
+      opts.bundle = path.resolve(argv[++i]);
+    } else if (arg === "--runs") {
+      opts.runs = Math.max(1, parseInt(argv[++i], 10));
+    } else if (arg.startsWith("--")) {
+      throw new Error(`Unknown option: ${arg}`);
+    } else {
+      opts.files.push(path.resolve(arg));
+    }
+  }
+  if (!opts.files.length) {
+    throw new Error(
+      "Usage: node decode_bench.mjs [--bundle PATH] [--runs N] FILE [FILE ...]"
+    );
+  }
+  return opts;
+}
+
+/**
+ * Serve the bundle as `/bundle.js` and FILES[i] as `/f/i/BASENAME`.
+ * Other files from the same folder are served as `/f/i/NAME` too, so relative
+ * URLs (e.g. of prefetch chunks) can be resolved.
+ */
+function startServer(bundlePath, files) {
+  const server = http.createServer((req, res) => {
+    let filePath = null;
+    if (req.url === "/") {
+      res.writeHead(200, { "Content-Type": "text/html" });
+      res.end(PAGE_HTML);
+      return;
+    } else if (req.url === "/bundle.js") {
+      filePath = bundlePath;
+    } else {
+      const m = req.url.match(/^\/f\/(\d+)\/([^/?#]+)/);
+      filePath =
+        m && files[+m[1]]
+          ? path.join(path.dirname(files[+m[1]]), path.basename(m[2]))
+          : null;
+    }
+    if (!filePath || !fs.existsSync(filePath)) {
+      res.writeHead(404);
+      res.end();
+      return;
+    }
+    res.writeHead(200, {
+      "Content-Type":
+        CONTENT_TYPES[path.extname(filePath)] ?? "application/octet-stream",
+    });
+    fs.createReadStream(filePath).pipe(res);
+  });
+  return new Promise((resolve) => {
+    server.listen(0, "127.0.0.1", () => resolve(server));
+  });
+}
+
+/** Run inside the page: load one fixture and return the phase times. */
+async function loadFixture(url) {
+  const { Wunderbaum } = window.mar10;
+  const sourceUtil = Wunderbaum.sourceUtil;
+  const isBinary = url.endsWith(".wbt");
+  const res = { parseMs: null, decodeMs: null };
+
+  if (isBinary && !sourceUtil?.decodeBinarySource) {
+    return { skipped: "Bundle does not support the binary format" };
+  }
+  let t;
+
+  if (url.endsWith(".ndjson")) {
+    res.fetchMs = null;
+    res.firstBatchMs = null;
+    const tree = new Wunderbaum({
+      element: "#tree",
+      debugLevel: 1,
+      source: [],
+      receive: () => {
+        res.firstBatchMs ??= performance.now() - t;
+      },
+    });
+    await tree.ready;
+    t = performance.now();
+    await tree.load(url);
+    res.buildMs = performance.now() - t;
+    res.nodeCount = tree.count();
+    window._benchTree = tree;
+    return res;
+  }
+
+  t = performance.now();
+  const response = await fetch(url);
+  const body = isBinary ? await response.arrayBuffer() : await response.text();
+  res.fetchMs = performance.now() - t;
+
+  let source;
+  t = performance.now();
+  if (isBinary) {
+    source = sourceUtil.decodeBinarySource(body);
+    res.decodeMs = performance.now() - t;
+  } else {
+    source = JSON.parse(body);
+    res.parseMs = performance.now() - t;
+
+    if (Array.isArray(source)) {
+      source = { children: source };
+    }
+    // Like `tree.load(url)`: prefetch chunk URLs are relative to the payload
+    for (const chunk of source._prefetch ?? []) {
+      chunk.url = new URL(chunk.url, response.url).href;
+    }
+    if (sourceUtil) {
+      // Otherwise decoding is measured as part of `tree.load()`
+      t = performance.now();
+      sourceUtil.decompressSourceData(source);
+      res.decodeMs = performance.now() - t;
+    }
+  }
+
+  const tree = new Wunderbaum({
+    element: "#tree",
+    debugLevel: 1,
+    source: [],
+  });
+  await tree.ready;
+  t = performance.now();
+  await tree.load(source);
+  res.buildMs = performance.now() - t;
+  if (source._prefetch) {
+    // Wait for the remaining chunks, so the heap size is reproducible
+    t = performance.now();
+    const pending = [...(tree._prefetchMap?.values() ?? [])];
+    await Promise.allSettled(pending.map((dfd) => dfd.promise()));
+    res.prefetchMs = performance.now() - t;
+  }
+  res.nodeCount = tree.count();
+  // Keep the tree alive, so it is included in the heap size
+  window._benchTree = tree;
+  return res;
+}
+
+async function benchFile(browser, baseUrl, idx, filePath, runs) {
+  const url = `${baseUrl}/f/${idx}/${path.basename(filePath)}`;
+  let best = null;
+
+  for (let run = 0; run < runs; run++) {
+    const page = await browser.newPage();
+    try {
+      await page.goto(baseUrl);
+      const cdp = await page.createCDPSession();
+      await cdp.send("HeapProfiler.collectGarbage");
+      const heapBefore = (await page.metrics()).JSHeapUsedSize;
+
+      const res = await page.evaluate(loadFixture, url);
+      if (res.skipped) {
+        return res;
+      }
+      await cdp.send("HeapProfiler.collectGarbage");
+      res.heapBytes = (await page.metrics()).JSHeapUsedSize - heapBefore;
+
+      if (!best) {
+        best = res;
+      } else {
+        for (const [k, v] of Object.entries(res)) {
+          if (k.endsWith("Ms") && v != null) {
+            best[k] = Math.min(best[k], v);
+          }
+        }
+        best.heapBytes = Math.min(best.heapBytes, res.heapBytes);
+      }
+    } finally {
+      await page.close();
+    }
+  }
+  for (const [k, v] of Object.entries(best)) {
+    if (k.endsWith("Ms") && v != null) {
+      best[k] = Math.round(v * 10) / 10;
+    }
+  }
+  return best;
+}
+
+async function main() {
+  const opts = parseArgs(process.argv.slice(2));
+  const server = await startServer(opts.bundle, opts.files);
+  const baseUrl = `http://127.0.0.1:${server.address().port}`;
+  const browser = await puppeteer.launch({ headless: true });
+  const results = [];
+
+  try {
+    for (const [idx, filePath] of opts.files.entries()) {
+      process.stderr.write(`Benchmarking ${path.basename(filePath)}...\n`);
+      const res = await benchFile(browser, baseUrl, idx, filePath, opts.runs);
+      results.push({ file: path.basename(filePath), ...res });
+    }
+  } finally {
+    await browser.close();
+    server.close();
+  }
+  process.stdout.write(JSON.stringify(results, null, 2) + "\n");
+}
+
+main().catch((err) => {
+  process.stderr.write(`${err.stack ?? err}\n`);
+  process.exit(1);
+});
@@ -17,7 +17,9 @@ See `test_tree_generator.py` for details.
 """
 
 from collections import Counter
+from copy import deepcopy
 from enum import Enum
+import hashlib
 import json
 
 from nutree.tree_generator import GenericNodeData
@@ -27,6 +29,12 @@ from nutree.typed_tree import TypedTree
 class FileFormat(Enum):
     nested = "nested"
     flat = "flat"
+    #: Like `flat`, but written as one header line, followed by one tuple per line
+    ndjson = "ndjson"
+
+
+#: Formats that use parent-referencing node tuples
+FLAT_FORMATS = {FileFormat.flat, FileFormat.ndjson}
 
 
 class Automatic:
@@ -115,6 +123,290 @@ def _iter_dict_pre_order(child_list: list):
     yield from _iter(child_list, None)
 
 
+def _sort_rank_key(val, null_value):
+    """Mimic the client's default `node.sort()` comparison for one value."""
+    if val is None:
+        val = null_value
+    if isinstance(val, bool):
+        return int(val)
+    if isinstance(val, str):
+        return val.lower()
+    return val
+
+
+def calc_sort_ranks(child_list: list, columns: list | None) -> dict:
+    """
+    Return precomputed sibling ranks for all sortable columns.
+
+    Result is a dict `{PROP_NAME: [RANK, ...]}` with one entry per node,
+    indexed by the pre-order position (i.e. the `_flat_comp` ordering).
+    A rank is the 0-based position of a node among its siblings when sorted in
+    ascending order, so the client can reorder in linear time instead of
+    comparing values.
+    The title column (`id: "*"`) is stored as `title`.
+    """
+    prop_names = [
+        "title" if col["id"] == "*" else col["id"]
+        for col in columns or []
+        if col.get("sortable")
+    ]
+    if not prop_names:
+        return {}
+
+    #: Flat list of node dicts in pre-order
+    node_list = []
+    #: Map parent_idx -> list of child indexes
+    sibling_map = {}
+    for parent_idx, node in _iter_dict_pre_order(child_list):
+        sibling_map.setdefault(parent_idx, []).append(len(node_list))
+        node_list.append(node)
+
+    res = {}
+    for prop_name in prop_names:
+        ranks = [0] * len(node_list)
+        for siblings in sibling_map.values():
+            values = [node_list[idx].get(prop_name) for idx in siblings]
+            # Like in the client, `null` compares as '' or 0, depending on
+            # the type of the other values:
+            null_value = 0
+            for v in values:
+                if v is not None:
+                    null_value = "" if isinstance(v, str) else 0
+                    break
+            # Python's sort is stable, so equal values keep their native order
+            order = sorted(
+                range(len(siblings)),
+                key=lambda i: _sort_rank_key(values[i], null_value),
+            )
+            for rank, i in enumerate(order):
+                ranks[siblings[i]] = rank
+        res[prop_name] = ranks
+    return res
+
+
+#: Prefix for `refKey` values that reference a subtree template
+TEMPLATE_REF_PREFIX = "~"
+
+
+def extract_subtree_templates(child_list: list) -> dict:
+    """
+    Replace repeated subtrees by references to shared templates (in-place).
+
+    Child lists are compared by a hash over all attributes of the child nodes
+    and their descendants (the attributes of the parent node itself are not
+    included, so e.g. differently named parents may share their children).
+    If a child list occurs more than once, it is stored as template and every
+    parent gets a `refKey` (`~0`, `~1`, ...) instead of `children`. The client
+    creates the child nodes from the template on demand (i.e. when the node is
+    expanded).
+    Since the referencing nodes share their children, they are also *clones*
+    in terms of `node.refKey`.
+
+    Child lists that contain nodes with a `key` or `refKey` are never
+    replaced, because keys must be unique. Parents that already have a
+    `refKey` are skipped as well.
+
+    Returns a dict `{REF_KEY: CHILD_LIST}` (templates may reference other
+    templates).
+    """
+    # Pass 1: calculate subtree hashes bottom-up.
+    # In pre-order all descendants are listed after their parent.
+    node_list = []
+    child_idx_list = []
+    for parent_idx, node in _iter_dict_pre_order(child_list):
+        if parent_idx is not None:
+            child_idx_list[parent_idx].append(len(node_list))
+        node_list.append(node)
+        child_idx_list.append([])
+
+    #: Hash over node attributes and the child list hash
+    subtree_hash_list = [None] * len(node_list)
+    #: Hash over the child list only (used to find repeated child lists)
+    children_hash_list = [None] * len(node_list)
+    #: True if the subtree (or the child list) contains keyed nodes
+    subtree_keyed = [False] * len(node_list)
+    children_keyed = [False] * len(node_list)
+    for idx in range(len(node_list) - 1, -1, -1):
+        node = node_list[idx]
+        h = hashlib.sha1()
+        keyed = False
+        for child_idx in child_idx_list[idx]:
+            h.update(subtree_hash_list[child_idx])
+            keyed = keyed or subtree_keyed[child_idx]
+        children_hash_list[idx] = h.digest()
+        children_keyed[idx] = keyed
+
+        attrs = {k: v for k, v in node.items() if k != "children"}
+        h = hashlib.sha1(json.dumps(attrs, sort_keys=True, default=str).encode())
+        h.update(children_hash_list[idx])
+        subtree_hash_list[idx] = h.digest()
+        subtree_keyed[idx] = keyed or "key" in node or "refKey" in node
+
+    hash_counts = Counter(
+        children_hash_list[idx]
+        for idx, child_idxs in enumerate(child_idx_list)
+        if child_idxs
+    )
+
+    # Pass 2: replace repeated child lists top-down (so we use the largest ones)
+    #: Map child list hash -> refKey
+    ref_key_map = {}
+    templates = {}
+    node_idx_map = {id(node): idx for idx, node in enumerate(node_list)}
+
+    def _replace(cl: list):
+        for node in cl:
+            idx = node_idx_map[id(node)]
+            children = node.get("children")
+            if not children:
+                continue
+            h = children_hash_list[idx]
+            if hash_counts[h] < 2 or children_keyed[idx] or "refKey" in node:
+                _replace(children)
+                continue
+            ref_key = ref_key_map.get(h)
+            if ref_key is None:
+                ref_key = f"{TEMPLATE_REF_PREFIX}{len(ref_key_map)}"
+                ref_key_map[h] = ref_key
+                templates[ref_key] = children
+                _replace(children)  # Templates may contain references, too
+            node["refKey"] = ref_key
+            del node["children"]
+
+    _replace(child_list)
+    return templates
+
+
+#: Supported aggregate functions for `calc_subtree_aggregates()`
+AGGREGATE_FUNCTIONS = {"sum", "min", "max"}
+
+
+def calc_subtree_aggregates(child_list: list, aggregates: dict | None) -> dict:
+    """
+    Return per-node subtree information as parallel arrays.
+
+    Result is a dict `{PROP_NAME: [VALUE, ...]}` with one entry per node,
+    indexed by the pre-order position (i.e. the `_flat_comp` ordering):
+
+    - `descendantCount`: number of descendants (0 for leaves)
+    - `depth`: 1 for top-level nodes (same as `node.getLevel()` on the client)
+    - For every `{"qty": ["sum"], "price": ["min", "max"]}` in `aggregates`,
+      `qtySum`, `priceMin`, `priceMax` with the aggregate over the node and its
+      descendants (`None` if no numeric value was found).
+
+    All values are calculated in a single bottom-up pass. This works, because
+    in pre-order all descendants are listed after their parent.
+    """
+    aggregates = aggregates or {}
+    #: List of (prop_name, func, result_name)
+    agg_list = []
+    for prop_name, funcs in aggregates.items():
+        for func in funcs:
+            if func not in AGGREGATE_FUNCTIONS:
+                raise ValueError(
+                    f"Unsupported aggregate {func!r} (expected {AGGREGATE_FUNCTIONS})"
+                )
+            agg_list.append((prop_name, func, f"{prop_name}{func.capitalize()}"))
+
+    parent_list = []
+    depth_list = []
+    agg_values = {result_name: [] for _, _, result_name in agg_list}
+
+    for parent_idx, node in _iter_dict_pre_order(child_list):
+        parent_list.append(parent_idx)
+        depth_list.append(1 if parent_idx is None else depth_list[parent_idx] + 1)
+        for prop_name, _, result_name in agg_list:
+            val = node.get(prop_name)
+            if isinstance(val, bool) or not isinstance(val, (int, float)):
+                val = None
+            agg_values[result_name].append(val)
+
+    descendant_count = [0] * len(parent_list)
+    # Bottom-up: fold every node into its parent
+    for idx in range(len(parent_list) - 1, -1, -1):
+        parent_idx = parent_list[idx]
+        if parent_idx is None:
+            continue
+        descendant_count[parent_idx] += descendant_count[idx] + 1
+        for _, func, result_name in agg_list:
+            values = agg_values[result_name]
+            val, parent_val = values[idx], values[parent_idx]
+            if val is None:
+                continue
+            if parent_val is None:
+                values[parent_idx] = val
+            elif func == "sum":
+                values[parent_idx] = parent_val + val
+            elif func == "min":
+                values[parent_idx] = min(parent_val, val)
+            else:
+                values[parent_idx] = max(parent_val, val)
+
+    res = {"descendantCount": descendant_count, "depth": depth_list}
+    res.update(agg_values)
+    return res
+
+
+#: Version of the search index format (see `build_search_index()`)
+SEARCH_INDEX_VERSION = 1
+
+
+def _iter_ngrams(text: str, n: int):
+    """Yield all distinct, lower-cased n-grams of `text`."""
+    text = text.lower()
+    yield from {text[i : i + n] for i in range(len(text) - n + 1)}
+
+
+def build_search_index(
+    child_list: list, *, fields: list | None = None, n: int = 3
+) -> dict:
+    """
+    Return an n-gram index that maps terms to node indexes.
+
+    Node indexes refer to the pre-order position (i.e. the `_flat_comp`
+    ordering).
+    Every n-gram of a (lower-cased) field value is a term. The posting list of
+    a term is sorted and delta-encoded, i.e. `[3, 2, 10]` means `[3, 5, 15]`.
+    A client can intersect the posting lists of all n-grams of a query to get
+    candidate nodes. Queries shorter than `n` cannot use the index.
+    """
+    fields = list(fields or ["title"])
+    #: Map field -> term -> list of node indexes
+    postings = {field: {} for field in fields}
+    node_count = 0
+
+    for idx, (_parent_idx, node) in enumerate(_iter_dict_pre_order(child_list)):
+        node_count += 1
+        for field in fields:
+            val = node.get(field)
+            if val is None or isinstance(val, bool):
+                continue
+            field_postings = postings[field]
+            for term in _iter_ngrams(str(val), n):
+                field_postings.setdefault(term, []).append(idx)
+
+    res_fields = {}
+    for field, field_postings in postings.items():
+        res_terms = {}
+        for term in sorted(field_postings.keys()):
+            # Indexes are already sorted, since we iterated in pre-order
+            prev = 0
+            deltas = []
+            for idx in field_postings[term]:
+                deltas.append(idx - prev)
+                prev = idx
+            res_terms[term] = deltas
+        res_fields[field] = res_terms
+
+    return {
+        "_format": "ngram",
+        "_version": SEARCH_INDEX_VERSION,
+        "n": n,
+        "nodeCount": node_count,
+        "fields": res_fields,
+    }
+
+
 def compress_child_list(
     child_list: list,
     *,
@@ -125,6 +417,9 @@ def compress_child_list(
     positional: list | Automatic = Automatic,
     auto_compress=True,
     auto_compress_bool: set | None = None,
+    sort_ranks: bool = False,
+    aggregates: dict | None = None,
+    templates: bool = False,
 ) -> dict:
     """
     Convert a child_list that was created by `generate_tree()`.
@@ -132,9 +427,49 @@ def compress_child_list(
     1. Optionally convert nested child list to flat parent-referencong list
     2. Shorten node dict keys using a `keyMap`
     3. In flat mode
+    4. Optionally add precomputed `_sortRanks` for sortable columns
+    5. Optionally add `_nodeData` with descendant counts, depth, and the
+       subtree `aggregates` (pass `{}` for counts and depth only)
+    6. Optionally replace repeated subtrees by `_templates` references
     """
     if type(child_list) is not list:
         raise RuntimeError(f"Expected JSON list (not {child_list!r})")
+
+    # Calculate ranks before node dicts are modified below
+    sort_rank_map = calc_sort_ranks(child_list, columns) if sort_ranks else None
+    node_data = (
+        calc_subtree_aggregates(child_list, aggregates)
+        if aggregates is not None
+        else None
+    )
+
+    template_map = None
+    if templates:
+        orig_ids = [id(node) for _, node in _iter_dict_pre_order(child_list)]
+        template_map = extract_subtree_templates(child_list)
+        # Nodes inside templates are no longer part of the pre-order list, so
+        # remove them from the parallel arrays. (Sort ranks stay valid, because
+        # child lists are always removed as a whole.)
+        kept_ids = {id(node) for _, node in _iter_dict_pre_order(child_list)}
+        keep = [node_id in kept_ids for node_id in orig_ids]
+        for parallel_map in (sort_rank_map, node_data):
+            for name, values in (parallel_map or {}).items():
+                parallel_map[name] = [v for v, k in zip(values, keep) if k]
+        template_node_count = sum(
+            len(list(_iter_dict_pre_order(t))) for t in template_map.values()
+        )
+        removed_count = len(orig_ids) - len(kept_ids)
+        print(
+            f"Templates: {len(template_map):,} shared child lists "
+            f"({template_node_count:,} nodes) replace {removed_count:,} nodes, "
+            f"saved {removed_count - template_node_count:,} nodes"
+        )
+
+    def _iter_all_nodes():
+        yield from _iter_dict_pre_order(child_list)
+        for template in (template_map or {}).values():
+            yield from _iter_dict_pre_order(template)
+
     #: Available short type names
     avail_short_names = list("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ")
 
@@ -175,7 +510,7 @@ def compress_child_list(
     # ----------
     # Pass 1: collect used attribute and type names
     seq = 0
-    for parent_idx, node in _iter_dict_pre_order(child_list):
+    for parent_idx, node in _iter_all_nodes():
         # Build/update key_map / inverse_key_map
         for attr in node.keys():
             attr_counts[attr] += 1
@@ -214,7 +549,7 @@ def compress_child_list(
     # ----------
     # Pass 2: collect used attribute and type names
 
-    for parent_idx, node in _iter_dict_pre_order(child_list):
+    def _shorten(node: dict):
         # Replace `"type": "TYPE_NAME"` with `"type": INDEX`
         node_type = node.get("type")
         if node_type:
@@ -228,7 +563,15 @@ def compress_child_list(
                 node[short] = val
                 del node[attr]
 
-        if format == FileFormat.flat:
+    # Templates are always stored in nested format
+    for template in (template_map or {}).values():
+        for _, node in _iter_dict_pre_order(template):
+            _shorten(node)
+
+    for parent_idx, node in _iter_dict_pre_order(child_list):
+        _shorten(node)
+
+        if format in FLAT_FORMATS:
             pos_args = [node.get(p) for p in positional_short_names]
             key_args = {
                 k: v for k, v in node.items() if k not in positional_short_names_set
@@ -242,7 +585,7 @@ def compress_child_list(
         # else:
         #     node =
 
-    if format == FileFormat.flat:
+    if format in FLAT_FORMATS:
         children = node_list
     else:
         children = child_list
@@ -266,14 +609,153 @@ def compress_child_list(
         # "_typeList": type_list,
         "_keyMap": inverse_key_map,  # since v0.7.0
         "_positional": positional,
+        "_sortRanks": sort_rank_map,
+        "_nodeData": node_data,
+        "_templates": template_map,
         "children": children,
     }
-    if format != FileFormat.flat:
+    if format not in FLAT_FORMATS:
         res.pop("_positional")
+    if not sort_rank_map:
+        res.pop("_sortRanks")
+    if node_data is None:
+        res.pop("_nodeData")
+    if not template_map:
+        res.pop("_templates")
     # pprint(res)
     return res
 
 
+def iter_ndjson_lines(data: dict):
+    """
+    Yield the lines of a compressed `ndjson` source (without trailing newline).
+
+    The first line is a JSON object that contains all header fields
+    (`_format`, `types`, `_keyMap`, ...), followed by one node tuple per line,
+    so the client can start adding nodes while the file is still loading.
+    """
+    if data.get("_format") != FileFormat.ndjson.value:
+        raise ValueError(f"Expected _format 'ndjson': {data.get('_format')!r}")
+    header = {k: v for k, v in data.items() if k != "children"}
+    separators = (",", ":")
+    yield json.dumps(header, separators=separators)
+    for node_tuple in data["children"]:
+        yield json.dumps(node_tuple, separators=separators)
+
+
+PLACEHOLDER_KEY_PREFIX = "~p"
+
+
+def split_viewport_payload(
+    child_list: list, *, row_budget: int = 100, chunk_size: int = 10_000
+) -> tuple[list, list]:
+    """
+    Split a tree into a small 'first paint' child list and prefetch chunks.
+
+    Rows are counted in display order, i.e. top-level nodes and descendants
+    of expanded nodes. Child lists are only included completely: if the
+    children of an expanded node don't fit into `row_budget` (or the node is
+    collapsed), the node becomes a lazy placeholder and its child list is
+    moved to a prefetch chunk. The placeholder gets a `key` (`~p0`, `~p1`, ...)
+    unless it already has one.
+
+    Returns `(FIRST_PAINT_CHILD_LIST, CHUNK_LIST)`.
+    Every chunk is a dict `{"nodeCount": N, "children": [{"key": KEY,
+    "children": [...]}, ...]}`, i.e. a nested source, with one entry per
+    placeholder.
+    Chunks are sorted by priority: children of expanded placeholders (which
+    are visible as soon as they arrive) first, then in display order.
+    The input `child_list` is not modified.
+    """
+    rows = len(child_list)
+    #: List of (priority, placeholder key, child list)
+    placeholders = []
+
+    def _count(cl: list) -> int:
+        return sum(1 + _count(node.get("children") or []) for node in cl)
+
+    def _split(cl: list) -> list:
+        nonlocal rows
+        res = []
+        for node in cl:
+            node = node.copy()
+            children = node.pop("children", None)
+            res.append(node)
+            if not children:
+                continue
+            expanded = bool(node.get("expanded"))
+            if expanded and rows + len(children) <= row_budget:
+                rows += len(children)
+                node["children"] = _split(children)
+                continue
+            node.setdefault("key", f"{PLACEHOLDER_KEY_PREFIX}{len(placeholders)}")
+            node["lazy"] = True
+            priority = (not expanded, len(placeholders))
+            placeholders.append((priority, node["key"], children))
+        return res
+
+    first_paint = _split(child_list)
+
+    chunks = []
+    chunk = None
+    for _priority, key, children in sorted(placeholders):
+        if chunk is None or chunk["nodeCount"] >= chunk_size:
+            chunk = {"nodeCount": 0, "children": []}
+            chunks.append(chunk)
+        chunk["children"].append({"key": key, "children": children})
+        chunk["nodeCount"] += _count(children)
+    return first_paint, chunks
+
+
+def build_viewport_payload(
+    child_list: list,
+    *,
+    chunk_url: str,
+    row_budget: int = 100,
+    types: dict | None = None,
+    columns: list | None = None,
+    key_map: dict | Automatic = Automatic,
+) -> tuple[dict, list]:
+    """
+    Return a compressed 'first paint' source and its prefetch chunks.
+
+    See `split_viewport_payload()`. `chunk_url` is a format string for the
+    chunk URLs, e.g. `"tree_vp_{}.json"`.
+    Returns `(SOURCE, [(CHUNK_URL, CHUNK_SOURCE), ...])`, where SOURCE
+    contains the `_prefetch` manifest.
+    The input `child_list` is not modified.
+    """
+    first_paint, chunks = split_viewport_payload(
+        deepcopy(child_list),  # DEEP-COPY, because nodes are compressed in-place
+        row_budget=row_budget,
+    )
+    manifest = []
+    chunk_sources = []
+    for chunk_idx, chunk in enumerate(chunks):
+        url = chunk_url.format(chunk_idx)
+        # Read the keys first: compression replaces `key` by its short name
+        keys = [entry["key"] for entry in chunk["children"]]
+        out = compress_child_list(
+            chunk["children"],
+            format=FileFormat.nested,
+            key_map=key_map,
+            auto_compress=True,
+        )
+        chunk_sources.append((url, out))
+        manifest.append({"url": url, "keys": keys, "nodeCount": chunk["nodeCount"]})
+
+    res = compress_child_list(
+        first_paint,
+        format=FileFormat.nested,
+        types=types,
+        columns=columns,
+        key_map=key_map,
+        auto_compress=True,
+    )
+    res["_prefetch"] = manifest
+    return res, chunk_sources
+
+
 def compress_source_file(file_path, *, key_map: dict) -> dict:
     with open(file_path, "rt") as fp:
         source = json.load(fp)
@@ -54,23 +54,77 @@ The generated fixture data is written to JSON files in different formats:
   The child nodes are compressed using `_valueMap`, `_keyMap`, and `_positional` 
   mappings.
 
+- tree_NAME_t_c_flat_comp.ndjson:
+  Same as `_flat_comp.json`, but written as newline-delimited JSON:
+  One header line, followed by one node tuple per line, so the client can
+  render the first rows while the rest is still loading.
+
+- tree_NAME_t_c.wbt:
+  Binary format with string table, varint parent deltas, typed value columns,
+  and a presence bitmap (see `binary_format.py`).
+  The file is decoded again and compared to the uncompressed nodes.
+  `--sort-ranks` and `--aggregates` are applied to the header as well, but
+  `--templates` is not (the binary format always contains all nodes).
+
 The generated JSON files are saved in the 'fixtures' directory.
+
+Options:
+- --sort-ranks:
+  Add precomputed `_sortRanks` for all sortable columns to the compressed
+  formats, so the client can sort by a linear reorder.
+- --search-index [FIELD ...]:
+  Write an n-gram search index sidecar (tree_NAME..._index.json) over the
+  `title` (default) or the given node properties.
+  Node indexes refer to the `_flat_comp` ordering.
+- --aggregates:
+  Add `_nodeData` with descendant counts, depth, and the subtree aggregates
+  defined by the fixture (e.g. sum of `qty`) to the compressed formats.
+- --templates:
+  Replace repeated subtrees by `refKey` references to shared `_templates`
+  in the compressed formats. (Note that node indexes of the search index
+  refer to the complete tree.)
+- --viewport [ROWS]:
+  Write a 'first paint' payload (tree_NAME..._vp.json) that contains only
+  the expanded nodes within a budget of ROWS (default: 100) visible rows.
+  Remaining child lists are replaced by lazy placeholders and written to
+  prefetch chunks (tree_NAME..._vp_N.json), which are listed in priority
+  order in the payload's `_prefetch` manifest.
+- --node-store:
+  Write a packed node store (tree_NAME....wbns) with fixed-width node
+  records, a key index, and a string heap (see `node_store.py`).
+  A server can open it with `mmap` and return the children of any node
+  without loading the complete tree.
+- --bench:
+  Load every generated source file with the `dist/` bundle in headless
+  Chrome (`decode_bench.mjs`, requires Node.js and puppeteer) and write
+  tree_NAME_bench.json, which contains file sizes and generation times, as
+  well as the client's parse, decode, and node creation times and heap size.
 """
 
+import argparse
 from copy import deepcopy
 from datetime import date
 import json
 import os
 from pathlib import Path
+import subprocess
 import sys
 from textwrap import dedent
+import time
 
 sys.path.append(os.path.dirname(__file__))
 
+from binary_format import decode_binary_source, encode_binary_source
+from node_store import NodeStore, write_node_store
 from generator import (
     Automatic,
     FileFormat,
+    build_search_index,
+    build_viewport_payload,
+    calc_sort_ranks,
+    calc_subtree_aggregates,
     compress_child_list,
+    iter_ndjson_lines,
     generate_random_wb_source,
 )
 from nutree.tree_generator import (
@@ -129,6 +183,10 @@ def _generate_fixture_store_XL() -> dict:
         "details",
     ]
 
+    # --- Subtree aggregates (`--aggregates`) ---
+
+    aggregates = {"qty": ["sum"], "price": ["min", "max"]}
+
     # --- Build nested node dictionary ---
 
     structure_def = {
@@ -175,6 +233,7 @@ def _generate_fixture_store_XL() -> dict:
             "columns": column_list,
             "key_map": key_map,
             "positional": positional,
+            "aggregates": aggregates,
             "children": random_data["child_list"],
         }
     )
@@ -264,6 +323,10 @@ def _generate_fixture_department_M() -> dict:
         "remarks",
     ]
 
+    # --- Subtree aggregates (`--aggregates`) ---
+
+    aggregates = {"age": ["min", "max"]}
+
     # --- Build nested node dictionary ---
     def _person_callback(data):
         # Initialize checkbox values
@@ -332,6 +395,7 @@ def _generate_fixture_department_M() -> dict:
             "columns": column_list,
             "key_map": key_map,
             "positional": positional,
+            "aggregates": aggregates,
             "children": random_data["child_list"],
         }
     )
@@ -372,6 +436,10 @@ def _generate_fixture_fmea_XL() -> dict:
     key_map = Automatic
     positional = Automatic  # Uses default (title, type)
 
+    # --- Subtree aggregates (`--aggregates`) ---
+
+    aggregates = {}  # Descendant counts and depth only
+
     # --- Build nested node dictionary ---
 
     structure_def = {
@@ -432,6 +500,7 @@ def _generate_fixture_fmea_XL() -> dict:
             "columns": column_list,
             "key_map": key_map,
             "positional": positional,
+            "aggregates": aggregates,
             "children": random_data["child_list"],
         }
     )
@@ -461,6 +530,66 @@ def _write_json(path: Path, data: dict, *, debug: bool):
     print(f"Created {path}, {_size_disp(path)}")
 
 
+def _write_ndjson(path: Path, data: dict):
+    with open(path, "wt") as fp:
+        for line in iter_ndjson_lines(data):
+            fp.write(line)
+            fp.write("\n")
+    print(f"Created {path}, {_size_disp(path)}")
+
+
+#: Max. seconds per file for `decode_bench.mjs` (e.g. if the browser hangs)
+BENCH_TIMEOUT_PER_FILE = 120
+
+
+def _run_bench(path: Path, variants: list, *, info: dict):
+    """Add client-side load times to `variants` and write the report."""
+    script = Path(__file__).parent / "decode_bench.mjs"
+    cmd = ["node", str(script), *(str(path.parent / v["file"]) for v in variants)]
+    try:
+        res = subprocess.run(
+            cmd,
+            stdout=subprocess.PIPE,
+            text=True,
+            check=True,
+            timeout=BENCH_TIMEOUT_PER_FILE * len(variants),
+        )
+        client_results = {r["file"]: r for r in json.loads(res.stdout)}
+    except (OSError, subprocess.SubprocessError) as e:  # Incl. timeout
+        print(f"Client benchmark failed: {e}")
+        client_results = {}
+
+    for v in variants:
+        v.update(client_results.get(v["file"], {}))
+    _write_json(path, {**info, "variants": variants}, debug=True)
+
+    def _ms(value) -> str:
+        return "-" if value is None else f"{value:,.0f}"
+
+    print(
+        f"{'File':<40} {'Size':>12} {'Encode':>7} {'First':>7} {'Parse':>7} "
+        f"{'Decode':>7} {'Build':>7} {'Total':>7} {'Heap':>10}"
+    )
+    for v in variants:
+        if "buildMs" not in v:
+            print(
+                f"{v['file']:<40} {v['size']:>12,} {_ms(v['encodeMs']):>7}  "
+                f"{v.get('skipped', 'n.a.')}"
+            )
+            continue
+        total = sum(v[k] or 0 for k in ("parseMs", "decodeMs", "buildMs"))
+        print(
+            f"{v['file']:<40} {v['size']:>12,} {_ms(v['encodeMs']):>7} "
+            f"{_ms(v.get('firstBatchMs')):>7} {_ms(v['parseMs']):>7} "
+            f"{_ms(v['decodeMs']):>7} {_ms(v['buildMs']):>7} {_ms(total):>7} "
+            f"{round(v['heapBytes'] / 1_000_000, 1):>7} MB"
+        )
+    print(
+        "(Times in milliseconds. NDJSON is streamed: 'First' is the time to the "
+        "first batch, 'Build' includes fetching and parsing.)"
+    )
+
+
 def main(locals):
     # --- Find all implementation functions (starting with 'generate_fixture_')
     METHOD_PREFIX = "_generate_fixture_"
@@ -474,19 +603,62 @@ def main(locals):
     ]
     avail_disp = "'{}'".format("', '".join(avail))
 
-    if len(sys.argv) != 2:
-        print("Usage: `python make_fixture.py NAME`")
-        print(f"Supported names: {avail_disp}")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(
+        description="Generate Wunderbaum test fixtures.",
+        epilog=f"Supported names: {avail_disp}",
+    )
+    parser.add_argument("name", help="Name of the fixture to generate")
+    parser.add_argument(
+        "--sort-ranks",
+        action="store_true",
+        help="Add precomputed `_sortRanks` for sortable columns",
+    )
+    parser.add_argument(
+        "--aggregates",
+        action="store_true",
+        help="Add `_nodeData` with descendant counts, depth, and subtree aggregates",
+    )
+    parser.add_argument(
+        "--templates",
+        action="store_true",
+        help="Replace repeated subtrees by references to `_templates`",
+    )
+    parser.add_argument(
+        "--search-index",
+        nargs="*",
+        metavar="FIELD",
+        help="Write an n-gram search index sidecar (default field: title)",
+    )
+    parser.add_argument(
+        "--viewport",
+        nargs="?",
+        type=int,
+        const=100,
+        metavar="ROWS",
+        help="Write a first-paint payload with prefetch chunks (default: 100 rows)",
+    )
+    parser.add_argument(
+        "--node-store",
+        action="store_true",
+        help="Write a packed node store for serving subtrees via `mmap`",
+    )
+    parser.add_argument(
+        "--bench",
+        action="store_true",
+        help="Measure client-side load times of all files (requires Node.js)",
+    )
+    args = parser.parse_args()
 
-    fixture_name = sys.argv[1]
+    fixture_name = args.name
     method = locals.get(f"{METHOD_PREFIX}{fixture_name}")
     if not callable(method):
         print(f"Invalid fixture name: {fixture_name!r}. Expected {avail_disp}")
         sys.exit(1)
 
     # --- Call the genreator method
+    start = time.monotonic()
     random_data = method()
+    elap_generate = time.monotonic() - start
 
     col_count = len(random_data["columns"]) if random_data.get("columns") else 0
 
@@ -495,6 +667,18 @@ def main(locals):
 
     print(f"Writing results to  {BASE_DIR}")
 
+    #: Generated source files with size and generation time (see `--bench`)
+    variants = []
+
+    def _add_variant(path: Path, elapsed: float):
+        variants.append(
+            {
+                "file": path.name,
+                "size": path.stat().st_size,
+                "encodeMs": round(1000 * elapsed, 1),
+            }
+        )
+
     # Remove previous fixtures
     for fn in BASE_DIR.glob(f"{FILE_PREFIX}{fixture_name}_*"):
         fn.unlink()
@@ -503,39 +687,49 @@ def main(locals):
     # Write as plain list
     file_name = f"{base_name}_p.json"
     path = BASE_DIR / file_name
+    start = time.monotonic()
     out = random_data["child_list"]
     _write_json(path, out, debug=DEBUG)
+    _add_variant(path, time.monotonic() - start)
 
     # Extended Standard (object format)
     file_name = f"{base_name}_o.json"
     path = BASE_DIR / file_name
+    start = time.monotonic()
     out = {"children": random_data["children"]}
     _write_json(path, out, debug=DEBUG)
+    _add_variant(path, time.monotonic() - start)
 
     if col_count:
         # Extended standard with columns
         file_name = f"{base_name}_c.json"
         path = BASE_DIR / file_name
+        start = time.monotonic()
         out = {"columns": random_data["columns"], "children": random_data["children"]}
         _write_json(path, out, debug=DEBUG)
+        _add_variant(path, time.monotonic() - start)
 
     if random_data["types"]:
         # Extended standard with types
         file_name = f"{base_name}_t.json"
         path = BASE_DIR / file_name
+        start = time.monotonic()
         out = {"types": random_data["types"], "children": random_data["children"]}
         _write_json(path, out, debug=DEBUG)
+        _add_variant(path, time.monotonic() - start)
 
         if col_count:
             # Extended standard with types and columns
             file_name = f"{base_name}_t_c.json"
             path = BASE_DIR / file_name
+            start = time.monotonic()
             out = {
                 "types": random_data["types"],
                 "columns": random_data["columns"],
                 "children": random_data["children"],
             }
             _write_json(path, out, debug=DEBUG)
+            _add_variant(path, time.monotonic() - start)
 
     suffix = ""
     if random_data["types"]:
@@ -543,8 +737,16 @@ def main(locals):
     if col_count:
         suffix += "_c"
 
+    if args.search_index is not None:
+        # Must be built from the uncompressed nodes
+        search_index = build_search_index(
+            random_data["child_list"], fields=args.search_index or ["title"]
+        )
+
     file_name = f"{base_name}{suffix}_flat_comp.json"
     path = BASE_DIR / file_name
+    flat_path = path
+    start = time.monotonic()
     out = compress_child_list(
         deepcopy(random_data["child_list"]),  # DEEP-COPY, because nodes are modified
         format=FileFormat.flat,
@@ -553,11 +755,115 @@ def main(locals):
         key_map=random_data["key_map"],
         positional=random_data["positional"],
         auto_compress=True,
+        sort_ranks=args.sort_ranks,
+        aggregates=random_data["aggregates"] if args.aggregates else None,
+        templates=args.templates,
     )
     _write_json(path, out, debug=DEBUG)
+    _add_variant(path, time.monotonic() - start)
+
+    file_name = f"{base_name}{suffix}_flat_comp.ndjson"
+    path = BASE_DIR / file_name
+    start = time.monotonic()
+    out = compress_child_list(
+        deepcopy(random_data["child_list"]),  # DEEP-COPY, because nodes are modified
+        format=FileFormat.ndjson,
+        types=random_data["types"],
+        columns=random_data["columns"],
+        key_map=random_data["key_map"],
+        positional=random_data["positional"],
+        auto_compress=True,
+        sort_ranks=args.sort_ranks,
+        aggregates=random_data["aggregates"] if args.aggregates else None,
+        templates=args.templates,
+    )
+    _write_ndjson(path, out)
+    _add_variant(path, time.monotonic() - start)
+
+    file_name = f"{base_name}{suffix}.wbt"
+    path = BASE_DIR / file_name
+    start = time.monotonic()
+    # Same pre-order header extras as the compressed formats (no templates)
+    extra = {}
+    if args.sort_ranks:
+        extra["_sortRanks"] = (
+            calc_sort_ranks(random_data["child_list"], random_data["columns"]) or None
+        )
+    if args.aggregates:
+        extra["_nodeData"] = calc_subtree_aggregates(
+            random_data["child_list"], random_data["aggregates"]
+        )
+    out = encode_binary_source(
+        random_data["child_list"],
+        types=random_data["types"],
+        columns=random_data["columns"],
+        extra=extra,
+    )
+    elap_encode = time.monotonic() - start
+    with open(path, "wb") as fp:
+        fp.write(out)
+    _add_variant(path, elap_encode)
+    start = time.monotonic()
+    decoded = decode_binary_source(out)
+    elap_decode = time.monotonic() - start
+    if decoded["children"] != random_data["child_list"]:
+        raise RuntimeError(f"Binary round trip failed for {path}")
+    ratio = path.stat().st_size / flat_path.stat().st_size
+    print(
+        f"Created {path}, {_size_disp(path)} = {ratio:.0%} of {flat_path.name} "
+        f"(encode: {elap_encode:.2f}s, decode: {elap_decode:.2f}s, round trip ok)"
+    )
+
+    if args.node_store:
+        file_name = f"{base_name}{suffix}.wbns"
+        path = BASE_DIR / file_name
+        start = time.monotonic()
+        write_node_store(random_data["child_list"], path)
+        elap_write = time.monotonic() - start
+        start = time.monotonic()
+        with NodeStore(path) as store:
+            top_nodes = store.children()
+            sub_nodes = store.children(top_nodes[0]["key"]) if top_nodes else []
+        elap_read = time.monotonic() - start
+        print(
+            f"Created {path}, {_size_disp(path)} (write: {elap_write:.2f}s, "
+            f"open and read {len(top_nodes) + len(sub_nodes):,} nodes: "
+            f"{1000 * elap_read:.1f}ms)"
+        )
+
+    if args.search_index is not None:
+        file_name = f"{base_name}{suffix}_index.json"
+        path = BASE_DIR / file_name
+        _write_json(path, search_index, debug=DEBUG)
+        ratio = path.stat().st_size / flat_path.stat().st_size
+        print(
+            f"  Search index v{search_index['_version']}: {_size_disp(path)} "
+            f"= {ratio:.0%} of {flat_path.name} ({_size_disp(flat_path)})"
+        )
+
+    if args.viewport is not None:
+        start = time.monotonic()
+        out, chunk_sources = build_viewport_payload(
+            random_data["child_list"],
+            chunk_url=f"{base_name}{suffix}_vp_{{}}.json",
+            row_budget=args.viewport,
+            types=random_data["types"],
+            columns=random_data["columns"],
+            key_map=random_data["key_map"],
+        )
+        for chunk_url, chunk_out in chunk_sources:
+            _write_json(BASE_DIR / chunk_url, chunk_out, debug=DEBUG)
+        path = BASE_DIR / f"{base_name}{suffix}_vp.json"
+        _write_json(path, out, debug=DEBUG)
+        _add_variant(path, time.monotonic() - start)
+        print(
+            f"  Deferred {sum(c['nodeCount'] for c in out['_prefetch']):,} nodes "
+            f"to {len(chunk_sources)} prefetch chunks"
+        )
 
     file_name = f"{base_name}{suffix}_comp.json"
     path = BASE_DIR / file_name
+    start = time.monotonic()
     out = compress_child_list(
         random_data["child_list"],
         format=FileFormat.nested,
@@ -566,8 +872,12 @@ def main(locals):
         key_map=random_data["key_map"],
         positional=random_data["positional"],
         auto_compress=True,
+        sort_ranks=args.sort_ranks,
+        aggregates=random_data["aggregates"] if args.aggregates else None,
+        templates=args.templates,
     )
     _write_json(path, out, debug=DEBUG)
+    _add_variant(path, time.monotonic() - start)
 
     print(
         "Generated tree with {node_count:,} nodes, {col_count} columns, depth: {depth}".format(
@@ -575,6 +885,25 @@ def main(locals):
         )
     )
 
+    if args.bench:
+        _run_bench(
+            BASE_DIR / f"{base_name}_bench.json",
+            variants,
+            info={
+                "fixture": fixture_name,
+                "date": date.today().isoformat(),
+                "nodeCount": random_data["node_count"],
+                "depth": random_data["depth"],
+                "columnCount": col_count,
+                "options": {
+                    "sortRanks": args.sort_ranks,
+                    "aggregates": args.aggregates,
+                    "templates": args.templates,
+                },
+                "generateMs": round(1000 * elap_generate, 1),
+            },
+        )
+
 
 if __name__ == "__main__":
     main(locals=locals())
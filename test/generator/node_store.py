@@ -0,0 +1,250 @@
+"""
+Packed, memory-mapped node store for serving subtrees (`*.wbns`).
+
+A server can open the store with `mmap`, so startup is instant and worker
+processes share the page cache. `NodeStore.children()` only reads the
+records of the requested child nodes, i.e. it runs in O(children), without
+parsing or loading the complete tree.
+
+Example:
+    with NodeStore("tree_store_XL.wbns") as store:
+        top_nodes = store.children()  # Top-level nodes
+        child_nodes = store.children(top_nodes[0]["key"])
+
+Returned nodes contain `key` and `lazy: true` (if they have children), so
+they can be passed as result of a `lazyLoad` request.
+
+Layout (all numbers little-endian):
+
+- Header (32 bytes): magic `b"WBNS"`, format version (1 byte), 3 pad bytes,
+  then uint32 values: node count, slot count of the key index, and offset
+  of the node records, the key index, and the string heap, and heap length.
+- Node records (32 bytes each, in pre-order):
+  parent, first child, next sibling (int32, -1 for none), child count,
+  key offset & length, data offset & length (uint32, relative to the heap).
+  Top-level nodes are chained via 'next sibling', starting with node 0.
+- Key index: open-addressing hash table (FNV-1a, linear probing) with one
+  uint32 per slot: node index + 1 (0 for empty slots).
+- String heap: UTF-8 keys and node data (JSON, without `key` and `children`).
+"""
+
+import json
+import mmap
+import struct
+
+try:
+    from .binary_format import iter_pre_order
+except ImportError:  # Imported as top-level module, e.g. by make_fixture.py
+    from binary_format import iter_pre_order
+
+MAGIC = b"WBNS"
+NODE_STORE_VERSION = 1
+#: Prefix of generated keys for nodes without `key`
+AUTO_KEY_PREFIX = "~n"
+
+_HEADER = struct.Struct("<4sB3xIIIIII")
+_RECORD = struct.Struct("<iiiIIIII")
+_SLOT = struct.Struct("<I")
+
+
+def _fnv1a(data: bytes) -> int:
+    h = 0x811C9DC5
+    for b in data:
+        h = ((h ^ b) * 0x01000193) & 0xFFFFFFFF
+    return h
+
+
+def write_node_store(child_list: list, path, *, auto_keys: bool = True) -> int:
+    """
+    Write `child_list` (uncompressed, nested format) as node store to `path`.
+
+    Nodes without `key` are stored with a generated key (`~n` + pre-order
+    index), unless `auto_keys` is false, in which case they cannot be looked
+    up.
+    Raises ValueError if a key is not unique (explicit keys should not use
+    the `~n` prefix).
+    Return the number of nodes.
+    """
+    node_list = []
+    parent_list = []
+    for parent_idx, node in iter_pre_order(child_list):
+        node_list.append(node)
+        parent_list.append(parent_idx)
+
+    node_count = len(node_list)
+    first_child = [-1] * node_count
+    next_sibling = [-1] * node_count
+    child_count = [0] * node_count
+    #: Last child per parent index (`None`: top-level)
+    last_child = {}
+    for idx, parent_idx in enumerate(parent_list):
+        prev_idx = last_child.get(parent_idx)
+        if prev_idx is not None:
+            next_sibling[prev_idx] = idx
+        elif parent_idx is not None:
+            first_child[parent_idx] = idx
+        if parent_idx is not None:
+            child_count[parent_idx] += 1
+        last_child[parent_idx] = idx
+
+    slot_count = 1
+    while slot_count < 2 * node_count:
+        slot_count *= 2
+    slots = [0] * slot_count
+    mask = slot_count - 1
+
+    heap = bytearray()
+    records = bytearray()
+    seen_keys = set()
+    for idx, node in enumerate(node_list):
+        key = node.get("key")
+        if key is None and auto_keys:
+            key = f"{AUTO_KEY_PREFIX}{idx}"
+        key_ofs = len(heap)
+        key_len = 0
+        if key is not None:
+            key = str(key)
+            if key in seen_keys:
+                raise ValueError(f"Duplicate key {key!r} (node #{idx})")
+            seen_keys.add(key)
+            key_bytes = key.encode("utf-8")
+            key_len = len(key_bytes)
+            heap += key_bytes
+            slot = _fnv1a(key_bytes) & mask
+            while slots[slot]:
+                slot = (slot + 1) & mask
+            slots[slot] = idx + 1
+
+        data = {k: v for k, v in node.items() if k not in ("children", "key")}
+        data_bytes = json.dumps(data, separators=(",", ":")).encode("utf-8")
+        data_ofs = len(heap)
+        heap += data_bytes
+
+        records += _RECORD.pack(
+            -1 if parent_list[idx] is None else parent_list[idx],
+            first_child[idx],
+            next_sibling[idx],
+            child_count[idx],
+            key_ofs,
+            key_len,
+            data_ofs,
+            len(data_bytes),
+        )
+
+    records_ofs = _HEADER.size
+    index_ofs = records_ofs + len(records)
+    heap_ofs = index_ofs + slot_count * _SLOT.size
+    header = _HEADER.pack(
+        MAGIC,
+        NODE_STORE_VERSION,
+        node_count,
+        slot_count,
+        records_ofs,
+        index_ofs,
+        heap_ofs,
+        len(heap),
+    )
+    with open(path, "wb") as fp:
+        fp.write(header)
+        fp.write(records)
+        fp.write(struct.pack(f"<{slot_count}I", *slots))
+        fp.write(heap)
+    return node_count
+
+
+class NodeStore:
+    """Read-only access to a node store file, using `mmap`."""
+
+    def __init__(self, path):
+        with open(path, "rb") as fp:
+            self._mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magic,
+            version,
+            self._node_count,
+            self._slot_count,
+            self._records_ofs,
+            self._index_ofs,
+            self._heap_ofs,
+            _heap_len,
+        ) = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"Not a Wunderbaum node store (invalid magic): {path}")
+        if version != NODE_STORE_VERSION:
+            self.close()
+            raise ValueError(f"Unsupported node store version {version}: {path}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self) -> int:
+        return self._node_count
+
+    def close(self) -> None:
+        self._mm.close()
+
+    def _record(self, idx: int) -> tuple:
+        return _RECORD.unpack_from(self._mm, self._records_ofs + idx * _RECORD.size)
+
+    def _str(self, ofs: int, length: int) -> str:
+        start = self._heap_ofs + ofs
+        return self._mm[start : start + length].decode("utf-8")
+
+    def find(self, key: str) -> int | None:
+        """Return the node index for `key` or None."""
+        key_bytes = str(key).encode("utf-8")
+        mask = self._slot_count - 1
+        slot = _fnv1a(key_bytes) & mask
+        while True:
+            (entry,) = _SLOT.unpack_from(self._mm, self._index_ofs + slot * 4)
+            if not entry:
+                return None
+            _, _, _, _, key_ofs, key_len, _, _ = self._record(entry - 1)
+            if key_len == len(key_bytes):
+                start = self._heap_ofs + key_ofs
+                if self._mm[start : start + key_len] == key_bytes:
+                    return entry - 1
+            slot = (slot + 1) & mask
+
+    def node(self, idx: int) -> dict:
+        """
+        Return the node dict (without `children`) for a node index.
+
+        Nodes with children are marked `lazy`.
+        """
+        _, _, _, count, key_ofs, key_len, data_ofs, data_len = self._record(idx)
+        res = json.loads(self._str(data_ofs, data_len))
+        if key_len:
+            res["key"] = self._str(key_ofs, key_len)
+        if count:
+            res["lazy"] = True
+        return res
+
+    def child_indexes(self, idx: int | None = None) -> list:
+        """Return the node indexes of the child nodes (top-level for None)."""
+        if idx is None:
+            child_idx = 0 if self._node_count else -1
+        else:
+            child_idx = self._record(idx)[1]
+        res = []
+        while child_idx >= 0:
+            res.append(child_idx)
+            child_idx = self._record(child_idx)[2]
+        return res
+
+    def children(self, key: str | None = None) -> list:
+        """
+        Return the child nodes of the node with `key` (top-level for None).
+
+        Raises KeyError if `key` is not found.
+        """
+        idx = None
+        if key is not None:
+            idx = self.find(key)
+            if idx is None:
+                raise KeyError(key)
+        return [self.node(child_idx) for child_idx in self.child_indexes(idx)]
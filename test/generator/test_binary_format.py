@@ -0,0 +1,84 @@
+"""
+Tests for the binary source format (run `python -m pytest test/generator`).
+"""
+
+import json
+from pathlib import Path
+import struct
+
+import pytest
+
+from .binary_format import decode_binary_source, encode_binary_source
+
+UNIT_DIR = Path(__file__).parent.parent / "unit"
+
+
+def _make_tree() -> list:
+    return [
+        {
+            "title": "Fünf Äpfel 🍎",
+            "type": "folder",
+            "qty": -3,
+            "price": 1.5,
+            "sale": True,
+            "misc": "text",
+            "children": [
+                {"title": "Node 1.1", "type": "book", "qty": 0, "price": 2},
+                {
+                    "title": "Node 1.2",
+                    "qty": 1_000_000_000_000,
+                    "price": -0.1,
+                    "sale": False,
+                    "misc": {"tags": ["a", "ü"], "n": None},
+                    "children": [{"title": "Node 1.2.1", "misc": 42}],
+                },
+            ],
+        },
+        {"title": "", "type": "folder", "qty": -1, "misc": [1, "x"]},
+    ]
+
+
+def test_round_trip():
+    child_list = _make_tree()
+    data = encode_binary_source(
+        child_list,
+        types={"folder": {"colspan": True}},
+        extra={"_nodeData": {"depth": [1, 2, 2, 3, 1]}},
+    )
+    res = decode_binary_source(data)
+
+    # Compare to the JSON form, i.e. what the client would receive
+    assert res["children"] == json.loads(json.dumps(child_list))
+    assert res["types"] == {"folder": {"colspan": True}}
+    assert res["_nodeData"] == {"depth": [1, 2, 2, 3, 1]}
+    assert "columns" not in res
+
+    # Every field uses the narrowest column kind
+    (header_len,) = struct.unpack_from("<I", data, 4)
+    header = json.loads(data[8 : 8 + header_len])
+    assert header["nodeCount"] == 5
+    assert dict(header["fields"]) == {
+        "title": "str",
+        "type": "str",
+        "qty": "int",
+        "price": "float",
+        "sale": "bool",
+        "misc": "json",
+    }
+
+
+def test_empty_tree():
+    res = decode_binary_source(encode_binary_source([]))
+    assert res == {"children": []}
+
+
+def test_invalid_data():
+    with pytest.raises(ValueError):
+        decode_binary_source(b"XYZ\x01")
+
+
+def test_unit_test_fixture():
+    """The committed binary fixture must match its JSON source."""
+    child_list = json.loads((UNIT_DIR / "ajax-simple.json").read_text())
+    expected = (UNIT_DIR / "ajax-simple.wbt").read_bytes()
+    assert encode_binary_source(child_list) == expected
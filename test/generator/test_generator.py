@@ -0,0 +1,71 @@
+"""
+Tests for the fixture generator (run `python -m pytest test/generator`).
+"""
+
+from copy import deepcopy
+import json
+
+from .generator import build_viewport_payload, split_viewport_payload
+
+
+def _make_tree() -> list:
+    return [
+        {
+            "title": "Folder 1",
+            "expanded": True,
+            "children": [{"title": "Node 1.1"}, {"title": "Node 1.2"}],
+        },
+        {
+            "title": "Folder 2",
+            "expanded": True,
+            "children": [{"title": f"Node 2.{i}"} for i in range(1, 6)],
+        },
+        {
+            "title": "Folder 3",
+            "key": "f3",
+            "children": [
+                {"title": "Folder 3.1", "children": [{"title": "Node 3.1.1"}]}
+            ],
+        },
+    ]
+
+
+def test_split_viewport_payload():
+    child_list = _make_tree()
+    orig = deepcopy(child_list)
+    first_paint, chunks = split_viewport_payload(child_list, row_budget=5)
+
+    assert child_list == orig
+    assert first_paint[0]["children"] == orig[0]["children"]
+    # Expanded, but exceeds the row budget:
+    assert first_paint[1] == {
+        "title": "Folder 2",
+        "expanded": True,
+        "key": "~p0",
+        "lazy": True,
+    }
+    assert first_paint[2]["key"] == "f3"
+    # Expanded placeholders first:
+    assert [e["key"] for c in chunks for e in c["children"]] == ["~p0", "f3"]
+    assert sum(c["nodeCount"] for c in chunks) == 7
+
+
+def test_build_viewport_payload(tmp_path):
+    child_list = _make_tree()
+    orig = deepcopy(child_list)
+    source, chunk_sources = build_viewport_payload(
+        child_list, chunk_url="tree_vp_{}.json", row_budget=5
+    )
+    assert child_list == orig
+
+    # Chunks are written like `make_fixture.py --viewport`
+    for url, chunk_source in chunk_sources:
+        (tmp_path / url).write_text(json.dumps(chunk_source))
+    manifest = source["_prefetch"]
+    assert [e["url"] for e in manifest] == ["tree_vp_0.json"]
+    assert manifest[0]["keys"] == ["~p0", "f3"]
+    assert manifest[0]["nodeCount"] == 7
+
+    chunk_source = json.loads((tmp_path / "tree_vp_0.json").read_text())
+    short_key = chunk_source["_keyMap"].get("key", "key")
+    assert [e[short_key] for e in chunk_source["children"]] == ["~p0", "f3"]
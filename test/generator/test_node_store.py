@@ -0,0 +1,70 @@
+"""
+Tests for the packed node store (run `python -m pytest test/generator`).
+"""
+
+import pytest
+
+from .node_store import NodeStore, write_node_store
+
+
+def _make_tree() -> list:
+    return [
+        {
+            "title": "Folder 1",
+            "key": "1",
+            "children": [
+                {"title": "Node 1.1", "qty": 3},
+                {"title": "Folder 1.2", "children": [{"title": "Node 1.2.1"}]},
+            ],
+        },
+        {"title": "Node 2", "key": "0"},  # Used to collide with auto keys
+    ]
+
+
+def test_node_store_round_trip(tmp_path):
+    path = tmp_path / "tree.wbns"
+    assert write_node_store(_make_tree(), path) == 5
+
+    with NodeStore(path) as store:
+        assert len(store) == 5
+        assert store.children() == [
+            {"title": "Folder 1", "key": "1", "lazy": True},
+            {"title": "Node 2", "key": "0"},
+        ]
+        assert store.children("1") == [
+            {"title": "Node 1.1", "qty": 3, "key": "~n1"},
+            {"title": "Folder 1.2", "key": "~n2", "lazy": True},
+        ]
+        assert store.children("~n2") == [{"title": "Node 1.2.1", "key": "~n3"}]
+        assert store.children("0") == []
+
+        assert store.find("0") == 4
+        assert store.find("~n1") == 1
+        assert store.find("missing") is None
+        with pytest.raises(KeyError):
+            store.children("missing")
+
+
+def test_node_store_without_auto_keys(tmp_path):
+    path = tmp_path / "tree.wbns"
+    write_node_store(_make_tree(), path, auto_keys=False)
+
+    with NodeStore(path) as store:
+        assert store.children("1") == [
+            {"title": "Node 1.1", "qty": 3},
+            {"title": "Folder 1.2", "lazy": True},
+        ]
+        assert store.find("~n1") is None
+
+
+def test_node_store_duplicate_keys(tmp_path):
+    path = tmp_path / "tree.wbns"
+    child_list = [{"title": "a", "key": "k"}, {"title": "b", "key": "k"}]
+    with pytest.raises(ValueError, match="Duplicate key 'k'"):
+        write_node_store(child_list, path)
+    assert not path.exists()
+
+    # Explicit keys must not use the prefix of generated keys
+    child_list = [{"title": "a"}, {"title": "b", "key": "~n0"}]
+    with pytest.raises(ValueError, match="Duplicate key '~n0'"):
+        write_node_store(child_list, path)
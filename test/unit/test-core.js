@@ -164,6 +164,60 @@ QUnit.module("Instance tests", (hooks) => {
     });
   });
 
+  test("Load NDJSON stream (fetch)", (assert) => {
+    assert.expect(4);
+    assert.timeout(1000); // Timeout after 1 second
+    const done = assert.async();
+
+    tree = new Wunderbaum({
+      element: "#tree",
+      source: "ajax-simple.ndjson",
+      receive: (e) => {
+        assert.equal(e.response._format, "ndjson", "receive(e) passes header");
+      },
+      init: (e) => {
+        const node1 = tree.findFirst("Node 1");
+        assert.equal(tree.count(), 4, "All nodes loaded");
+        assert.true(node1.expanded, "Short names are expanded");
+        assert.equal(node1.children[1].title, "Node 1.2", "Parent index");
+        done();
+      },
+    });
+  });
+
+  test("Load NDJSON stream without header (fetch)", async (assert) => {
+    assert.expect(2);
+    assert.timeout(1000); // Timeout after 1 second
+
+    tree = new Wunderbaum({
+      element: "#tree",
+      error: (e) => {
+        assert.ok(e.error, "error(e) is fired");
+      },
+    });
+    await assert.rejects(tree.load("ajax-empty.ndjson"), /header/, "Rejected");
+  });
+
+  test("Load binary format (fetch, round trip)", async (assert) => {
+    assert.expect(2);
+    assert.timeout(1000); // Timeout after 1 second
+
+    // Keys are generated, so we ignore them:
+    const toDictArray = () =>
+      tree.toDictArray((d) => {
+        delete d.key;
+      });
+    tree = new Wunderbaum({ element: "#tree" });
+    await tree.load("ajax-simple.json");
+    const expected = toDictArray();
+
+    // ajax-simple.wbt was created from ajax-simple.json, using
+    // test/generator/binary_format.py
+    await tree.load("ajax-simple.wbt");
+    assert.equal(tree.count(), 4, "All nodes loaded");
+    assert.deepEqual(toDictArray(), expected, "Same as JSON");
+  });
+
   test("applyCommand", (assert) => {
     assert.expect(2);
     assert.timeout(1000); // Timeout after 1 second
@@ -221,4 +275,319 @@ QUnit.module("Instance tests", (hooks) => {
       },
     });
   });
+
+  test("sort with precomputed _sortRanks", (assert) => {
+    assert.expect(3);
+    assert.timeout(1000); // Timeout after 1 second
+    const done = assert.async();
+
+    tree = new Wunderbaum({
+      element: "#tree",
+      source: {
+        // Ranks are deliberately 'wrong', to prove that they are used.
+        // Pre-order: a, x, y, b, c
+        _sortRanks: { title: [2, 1, 0, 0, 1] },
+        children: [
+          { title: "a", children: [{ title: "x" }, { title: "y" }] },
+          { title: "b" },
+          { title: "c" },
+        ],
+      },
+      init: (e) => {
+        const titles = (nodes) => nodes.map((n) => n.title).join(",");
+        tree.sort({ propName: "title" });
+        assert.equal(titles(tree.root.children), "b,c,a", "Ranks are used");
+        assert.equal(titles(tree.findFirst("a").children), "y,x", "Deep");
+
+        tree.sort({ propName: "title", useSortRanks: false });
+        assert.equal(titles(tree.root.children), "a,b,c", "Fallback");
+        done();
+      },
+    });
+  });
+
+  test("sort descending with precomputed _sortRanks keeps ties", (assert) => {
+    assert.expect(2);
+    assert.timeout(1000); // Timeout after 1 second
+    const done = assert.async();
+
+    tree = new Wunderbaum({
+      element: "#tree",
+      source: {
+        _sortRanks: { title: [1, 2, 0] },
+        children: [
+          { title: "x", key: "x1" },
+          { title: "x", key: "x2" },
+          { title: "a", key: "a" },
+        ],
+      },
+      init: (e) => {
+        const keys = (nodes) => nodes.map((n) => n.key).join(",");
+        tree.sort({ propName: "title", order: "desc" });
+        assert.equal(keys(tree.root.children), "x1,x2,a", "Ranks");
+        tree.sort({ propName: "title", order: "desc", useSortRanks: false });
+        assert.equal(keys(tree.root.children), "x1,x2,a", "Same as fallback");
+        done();
+      },
+    });
+  });
+
+  test("sort with precomputed _sortRanks after edit", (assert) => {
+    assert.expect(2);
+    assert.timeout(1000); // Timeout after 1 second
+    const done = assert.async();
+
+    tree = new Wunderbaum({
+      element: "#tree",
+      source: {
+        _sortRanks: { title: [0, 1, 2] },
+        children: [{ title: "a" }, { title: "b" }, { title: "c" }],
+      },
+      init: (e) => {
+        const titles = (nodes) => nodes.map((n) => n.title).join(",");
+        tree.findFirst("a").setTitle("d");
+        assert.false("_sortRank_title" in tree.findFirst("d").data);
+        tree.sort({ propName: "title" });
+        assert.equal(titles(tree.root.children), "b,c,d", "Stale ranks");
+        done();
+      },
+    });
+  });
+
+  test("load precomputed _nodeData", (assert) => {
+    assert.expect(3);
+    assert.timeout(1000); // Timeout after 1 second
+    const done = assert.async();
+
+    tree = new Wunderbaum({
+      element: "#tree",
+      source: {
+        _nodeData: { descendantCount: [2, 0, 0, 0], qtySum: [3, 1, 2, null] },
+        children: FIXTURE_1,
+      },
+      init: (e) => {
+        const node1 = tree.findFirst("Node 1");
+        const node2 = tree.findFirst("Node 2");
+        assert.equal(node1.data.descendantCount, 2);
+        assert.equal(node1.data.qtySum, 3);
+        assert.false("qtySum" in node2.data, "null values are skipped");
+        done();
+      },
+    });
+  });
+
+  test("load shared subtree _templates", (assert) => {
+    assert.expect(4);
+    assert.timeout(1000); // Timeout after 1 second
+    const done = assert.async();
+
+    tree = new Wunderbaum({
+      element: "#tree",
+      source: {
+        _templates: { "~0": [{ title: "a" }, { title: "b" }] },
+        children: [
+          { title: "Node 1", refKey: "~0" },
+          { title: "Node 2", refKey: "~0" },
+        ],
+      },
+      init: async (e) => {
+        const node1 = tree.findFirst("Node 1");
+        const node2 = tree.findFirst("Node 2");
+        assert.true(node1.isUnloaded(), "Templates are expanded on demand");
+        await node1.setExpanded();
+        assert.equal(node1.children.length, 2);
+        assert.true(node2.isUnloaded());
+        assert.true(node1.isClone());
+        done();
+      },
+    });
+  });
+
+  test("load expanded _templates references with _nodeData", (assert) => {
+    assert.expect(4);
+    assert.timeout(1000); // Timeout after 1 second
+    const done = assert.async();
+
+    tree = new Wunderbaum({
+      element: "#tree",
+      source: {
+        _templates: { "~0": [{ title: "a" }, { title: "b" }] },
+        _nodeData: { descendantCount: [2, 0] },
+        children: [
+          { title: "Node 1", refKey: "~0", expanded: true },
+          { title: "Node 2" },
+        ],
+      },
+      init: (e) => {
+        const node1 = tree.findFirst("Node 1");
+        const node2 = tree.findFirst("Node 2");
+        assert.equal(node1.children.length, 2, "Expanded template loaded");
+        assert.equal(node1.data.descendantCount, 2);
+        assert.equal(node2.data.descendantCount, 0, "Template nodes skipped");
+        assert.false("descendantCount" in node1.children[0].data);
+        done();
+      },
+    });
+  });
+
+  test("load NDJSON with expanded _templates and _nodeData", (assert) => {
+    assert.expect(4);
+    assert.timeout(1000); // Timeout after 1 second
+    const done = assert.async();
+
+    tree = new Wunderbaum({
+      element: "#tree",
+      source: "ajax-templates.ndjson",
+      init: (e) => {
+        const node1 = tree.findFirst("Node 1");
+        const node2 = tree.findFirst("Node 2");
+        assert.equal(node1.children.length, 2, "Expanded template loaded");
+        assert.equal(node1.data.descendantCount, 2);
+        assert.equal(node2.data.descendantCount, 0, "Template nodes skipped");
+        assert.false("descendantCount" in node1.children[0].data);
+        done();
+      },
+    });
+  });
+
+  test("load first-paint payload with _prefetch chunks", (assert) => {
+    assert.expect(3);
+    assert.timeout(1000); // Timeout after 1 second
+    const done = assert.async();
+
+    tree = new Wunderbaum({
+      element: "#tree",
+      source: {
+        _prefetch: [{ url: "ajax-prefetch-chunk.json", keys: ["~p0"] }],
+        children: [
+          { title: "Placeholder", key: "~p0", lazy: true },
+          { title: "Node 2" },
+        ],
+      },
+      init: async (e) => {
+        const node = tree.findKey("~p0");
+        assert.true(node.isUnloaded());
+        // Waits for the chunk (no `lazyLoad` event required):
+        await node.setExpanded();
+        assert.equal(node.children.length, 2);
+        assert.equal(node.children[0].title, "Sub 1");
+        done();
+      },
+    });
+  });
+
+  test("load first-paint NDJSON payload with fetch options", async (assert) => {
+    assert.expect(4);
+    assert.timeout(1000); // Timeout after 1 second
+
+    // Record all requests
+    const origFetch = window.fetch;
+    const requests = [];
+    window.fetch = (url, opts) => {
+      requests.push({ url: url, opts: opts });
+      return origFetch(url, opts);
+    };
+    try {
+      tree = new Wunderbaum({ element: "#tree" });
+      await tree.load({
+        url: "ajax-prefetch.ndjson",
+        options: { headers: { "X-Test": "foo" } },
+      });
+      const node = tree.findKey("~p0");
+      await node.setExpanded();
+      assert.equal(node.children.length, 2);
+      assert.equal(requests.length, 2, "Payload and one chunk");
+      assert.equal(
+        requests[1].url,
+        new URL("ajax-prefetch-chunk.json", document.baseURI).href,
+        "Chunk URL is resolved against the payload URL"
+      );
+      assert.equal(requests[1].opts.headers["X-Test"], "foo", "Same options");
+    } finally {
+      window.fetch = origFetch;
+    }
+  });
+
+  test("filter with search index", (assert) => {
+    assert.expect(4);
+    assert.timeout(1000); // Timeout after 1 second
+    const done = assert.async();
+
+    tree = new Wunderbaum({
+      element: "#tree",
+      source: FIXTURE_1,
+      init: (e) => {
+        // Deliberately incomplete, to prove that only candidates are checked:
+        tree.setSearchIndex({
+          _format: "ngram",
+          _version: 1,
+          n: 3,
+          nodeCount: 4,
+          fields: { title: { nod: [1, 2], ode: [1, 2] } },
+        });
+        assert.equal(tree.filterNodes("node", {}), 2, "Candidates only");
+        assert.equal(tree.filterNodes("no", {}), 4, "Query too short");
+        assert.equal(
+          tree.filterNodes("node", { useSearchIndex: false }),
+          4,
+          "Disabled"
+        );
+        assert.deepEqual(tree.lookupSearchIndex("xyz"), [], "No candidates");
+        done();
+      },
+    });
+  });
+
+  test("filter with search index after sort", (assert) => {
+    assert.expect(5);
+    assert.timeout(1000); // Timeout after 1 second
+    const done = assert.async();
+
+    tree = new Wunderbaum({
+      element: "#tree",
+      source: [{ title: "beta" }, { title: "alpha" }],
+      init: (e) => {
+        tree.setSearchIndex({
+          _format: "ngram",
+          _version: 1,
+          n: 3,
+          nodeCount: 2,
+          fields: { title: { alp: [1], bet: [0] } },
+        });
+        tree.sort({ propName: "title" });
+        assert.equal(tree.filterNodes("alpha", {}), 1, "Sorted: 1 match");
+        assert.ok(tree.findFirst("alpha").match, "Sorted: 'alpha' matched");
+        assert.notOk(tree.findFirst("beta").match, "Sorted: 'beta' reset");
+
+        tree.root.addChildren({ title: "alpha 2" });
+        assert.equal(tree.filterNodes("alpha", {}), 2, "Added: full scan");
+        assert.equal(tree.lookupSearchIndex("alpha"), null, "Index dropped");
+        done();
+      },
+    });
+  });
+
+  test("filter with search index after setTitle", (assert) => {
+    assert.expect(2);
+    assert.timeout(1000); // Timeout after 1 second
+    const done = assert.async();
+
+    tree = new Wunderbaum({
+      element: "#tree",
+      source: [{ title: "beta" }, { title: "alpha" }],
+      init: (e) => {
+        tree.setSearchIndex({
+          _format: "ngram",
+          _version: 1,
+          n: 3,
+          nodeCount: 2,
+          fields: { title: { alp: [1], bet: [0] } },
+        });
+        tree.findFirst("beta").setTitle("alpha 2");
+        assert.equal(tree.filterNodes("alpha", {}), 2, "Renamed: full scan");
+        assert.equal(tree.lookupSearchIndex("alpha"), null, "Index dropped");
+        done();
+      },
+    });
+  });
 });